@@ -40,6 +40,19 @@ with app.app_context():
     db.create_all()
     logging.info("Database tables created")
     
+    # Apply schema changes to existing tables (indexes, new columns)
+    from utils.migrations import run_migrations
+    run_migrations()
+    
+    # Count SQL statements per request and flag N+1 patterns (debug/testing or QUERY_COUNTER=1)
+    from utils.query_counter import query_counter
+    query_counter.init_app(app, db.engine)
+    
+    # Response time and SQL time per request, for /admin/performance (REQUEST_PROFILING=0 disables)
+    if os.environ.get('REQUEST_PROFILING', '1') != '0':
+        from utils.request_profiler import request_profiler
+        request_profiler.init_app(app, db.engine)
+    
     # Create admin user
     auth.create_admin_user()
     
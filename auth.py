@@ -11,6 +11,7 @@ from werkzeug.security import generate_password_hash
 
 from app import app, db
 from models import User, PendingUser, UserRole
+from utils.user_cache import user_cache
 
 # Initialize Flask-Login
 login_manager = LoginManager()
@@ -21,8 +22,8 @@ login_manager.login_message_category = 'info'
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID"""
-    return User.query.get(user_id)
+    """Load user by ID (cached for a short time, see utils/user_cache.py)"""
+    return user_cache.load(user_id)
 
 @login_manager.unauthorized_handler
 def unauthorized():
@@ -185,6 +186,7 @@ def approve_user(pending_id):
         db.session.add(user)
         db.session.delete(pending_user)
         db.session.commit()
+        user_cache.invalidate(user.id)
         
         flash(f'Usuário {user.full_name} aprovado com sucesso!', 'success')
         
@@ -0,0 +1,145 @@
+"""
+Benchmark for the acquisition list and dashboard queries with and without
+the indexes added by migration 1.
+
+Usage:
+    python benchmarks/bench_acquisition_queries.py [--sizes 10000 100000 1000000] [--repeat 5]
+
+The database is taken from BENCH_DATABASE_URL (defaults to a throwaway
+SQLite file). Never point it at a production database: the acquisitions
+table is filled with synthetic rows.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = os.environ.get(
+    'BENCH_DATABASE_URL',
+    'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+)
+
+from sqlalchemy import func, insert  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import (Acquisition, AcquisitionStatus, AcquisitionType, Category,  # noqa: E402
+                    CostCenter, StatusHistory, Document, User)
+
+INDEXED_MODELS = (Acquisition, StatusHistory, Document)
+
+
+def fill_acquisitions(target):
+    """Insert synthetic acquisitions until the table has `target` rows"""
+    current = Acquisition.query.count()
+    if current >= target:
+        return
+
+    user_ids = [u.id for u in User.query.all()]
+    categories = [(c.id, c.type) for c in Category.query.all()]
+    cost_center_ids = [c.id for c in CostCenter.query.all()]
+    statuses = list(AcquisitionStatus)
+    start = datetime.now() - timedelta(days=3 * 365)
+
+    batch = []
+    for n in range(current, target):
+        category_id, acquisition_type = random.choice(categories)
+        batch.append({
+            'title': f'Aquisição de teste {n}',
+            'description': 'Gerado pelo benchmark',
+            'justification': 'Gerado pelo benchmark',
+            'type': acquisition_type,
+            'status': random.choice(statuses),
+            'final_value': round(random.uniform(10, 10000), 2) if random.random() < 0.6 else None,
+            'requester_id': random.choice(user_ids),
+            'category_id': category_id,
+            'cost_center_id': random.choice(cost_center_ids),
+            'created_at': start + timedelta(minutes=random.randint(0, 3 * 365 * 24 * 60)),
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(Acquisition), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Acquisition), batch)
+    db.session.commit()
+
+
+def drop_indexes():
+    for model in INDEXED_MODELS:
+        for index in model.__table__.indexes:
+            index.drop(bind=db.engine, checkfirst=True)
+
+
+def create_indexes():
+    for model in INDEXED_MODELS:
+        for index in model.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+
+def list_page():
+    query = Acquisition.query.options(
+        joinedload(Acquisition.category),
+        joinedload(Acquisition.cost_center),
+        joinedload(Acquisition.requester)
+    ).filter(Acquisition.status == AcquisitionStatus.EM_ANALISE)
+    query.order_by(Acquisition.created_at.desc()).paginate(page=5, per_page=20, error_out=False)
+
+
+def dashboard():
+    Acquisition.query.count()
+    Acquisition.query.filter_by(type=AcquisitionType.SERVICO).count()
+    Acquisition.query.filter_by(status=AcquisitionStatus.EM_ANALISE).count()
+    Acquisition.query.order_by(Acquisition.created_at.desc()).limit(5).all()
+
+    current_year = datetime.now().year
+    db.session.query(
+        func.extract('month', Acquisition.created_at),
+        Acquisition.type,
+        func.sum(Acquisition.final_value)
+    ).filter(
+        Acquisition.created_at >= datetime(current_year, 1, 1),
+        Acquisition.created_at < datetime(current_year + 1, 1, 1),
+        Acquisition.final_value.isnot(None)
+    ).group_by(func.extract('month', Acquisition.created_at), Acquisition.type).all()
+
+    db.session.query(Acquisition.status, func.count(Acquisition.id)).group_by(Acquisition.status).all()
+
+
+def timed(func, repeat):
+    """Median wall time in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'query':>10} {'before (ms)':>12} {'after (ms)':>12}")
+    with app.app_context():
+        for size in sorted(args.sizes):
+            fill_acquisitions(size)
+            for name, func in (('list', list_page), ('dashboard', dashboard)):
+                drop_indexes()
+                before = timed(func, args.repeat)
+                create_indexes()
+                after = timed(func, args.repeat)
+                print(f"{size:>10} {name:>10} {before:>12.1f} {after:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark for email rendering: the previous inline templates, compiled by
+render_template_string() on every message, against the precompiled
+templates in templates/email (HTML plus plain-text alternative), one
+message at a time and as a batch for many recipients.
+
+Usage:
+    python benchmarks/bench_email_render.py [--messages 1000]
+
+Nothing is sent; the acquisition is a stand-in object with the attributes
+the templates read.
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, render_template_string  # noqa: E402
+
+from utils.email_service import email_templates  # noqa: E402
+
+# Templates as they were inlined in EmailService before the registry
+LEGACY_STATUS_TEMPLATE = """
+<html>
+<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+        <div style="background: #1e4a6b; color: white; padding: 20px; text-align: center;">
+            <h1>SENAI Morvan Figueiredo</h1>
+            <h2>Sistema de Acompanhamento de Aquisições</h2>
+        </div>
+
+        <div style="padding: 20px; background: #f9f9f9; border-left: 4px solid #1e4a6b;">
+            <h3>Olá, {{ user_name }}!</h3>
+            <p>A solicitação <strong>#{{ acquisition.id }}</strong> teve seu status atualizado.</p>
+
+            <div style="margin: 20px 0; padding: 15px; background: white; border-radius: 5px;">
+                <h4>Detalhes da Solicitação:</h4>
+                <p><strong>Título:</strong> {{ acquisition.title }}</p>
+                <p><strong>Tipo:</strong> {{ acquisition.type_display }}</p>
+                <p><strong>Status Atual:</strong> <span style="color: #1e4a6b; font-weight: bold;">{{ acquisition.status_display }}</span></p>
+                <p><strong>Solicitante:</strong> {{ acquisition.requester.full_name }}</p>
+                <p><strong>Data da Solicitação:</strong> {{ acquisition.created_at.strftime('%d/%m/%Y %H:%M') }}</p>
+            </div>
+
+            <p>Para mais detalhes, acesse o sistema de acompanhamento.</p>
+        </div>
+
+        <div style="text-align: center; padding: 20px; color: #666; font-size: 12px;">
+            <p>Este é um e-mail automático do Sistema de Acompanhamento de Aquisições - SENAI Morvan Figueiredo</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+LEGACY_APPROVAL_TEMPLATE = """
+<html>
+<body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+        <div style="background: #d32f2f; color: white; padding: 20px; text-align: center;">
+            <h1>SENAI Morvan Figueiredo</h1>
+            <h2>Solicitação Aguardando Aprovação</h2>
+        </div>
+
+        <div style="padding: 20px; background: #fff3e0; border-left: 4px solid #d32f2f;">
+            <h3>Olá, {{ approver_name }}!</h3>
+            <p>Uma nova solicitação está aguardando sua aprovação.</p>
+
+            <div style="margin: 20px 0; padding: 15px; background: white; border-radius: 5px;">
+                <h4>Detalhes da Solicitação:</h4>
+                <p><strong>Título:</strong> {{ acquisition.title }}</p>
+                <p><strong>Tipo:</strong> {{ acquisition.type_display }}</p>
+                <p><strong>Valor Estimado:</strong> R$ {{ "%.2f"|format(acquisition.estimated_value) if acquisition.estimated_value else "Não informado" }}</p>
+                <p><strong>Solicitante:</strong> {{ acquisition.requester.full_name }}</p>
+                <p><strong>Justificativa:</strong> {{ acquisition.justification[:200] }}{{ "..." if acquisition.justification|length > 200 else "" }}</p>
+            </div>
+
+            <p style="color: #d32f2f; font-weight: bold;">Acesse o sistema para revisar e aprovar a solicitação.</p>
+        </div>
+
+        <div style="text-align: center; padding: 20px; color: #666; font-size: 12px;">
+            <p>Este é um e-mail automático do Sistema de Acompanhamento de Aquisições - SENAI Morvan Figueiredo</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+def fake_acquisition():
+    return SimpleNamespace(
+        id=123,
+        title='Notebooks para o laboratório de informática',
+        type_display='Insumo',
+        status_display='Aprovado',
+        estimated_value=15432.5,
+        justification='Substituição dos equipamentos do laboratório. ' * 10,
+        requester=SimpleNamespace(full_name='Maria Souza'),
+        created_at=datetime(2024, 3, 1, 14, 30),
+    )
+
+
+def timed(func, count):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=1000)
+    args = parser.parse_args()
+
+    acquisition = fake_acquisition()
+    names = [f'Usuário {n}' for n in range(args.messages)]
+    # render_template_string needs an app context, as it had in the request
+    legacy_app = Flask(__name__)
+
+    print(f"{'template':>20} {'legacy (us/msg)':>16} {'compiled (us/msg)':>18} {'batch (us/msg)':>15}")
+    cases = [
+        ('status_notification', LEGACY_STATUS_TEMPLATE, 'user_name',
+         {'acquisition': acquisition, 'new_status': 'aprovado'}),
+        ('approval_request', LEGACY_APPROVAL_TEMPLATE, 'approver_name',
+         {'acquisition': acquisition}),
+    ]
+    for name, legacy_template, name_key, context in cases:
+        def legacy():
+            with legacy_app.app_context():
+                for recipient in names:
+                    render_template_string(legacy_template, **context, **{name_key: recipient})
+
+        def compiled():
+            for recipient in names:
+                email_templates.render(name, **context, **{name_key: recipient})
+
+        def batch():
+            email_templates.render_batch(name, [{**context, name_key: recipient} for recipient in names])
+
+        print(f"{name:>20} {timed(legacy, len(names)):>16.1f} {timed(compiled, len(names)):>18.1f} "
+              f"{timed(batch, len(names)):>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
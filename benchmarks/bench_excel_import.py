@@ -0,0 +1,163 @@
+"""
+Benchmark for the Excel importer: the previous per-row ORM import (one
+duplicate-check query and one ORM object per row) against the set-based,
+streaming import in utils/excel_importer.py, plus the cost of parsing the
+whole file with pandas versus the streaming preview, and a CSV import of
+the same number of rows with the "exportacao_detalhada" layout.
+
+Usage:
+    python benchmarks/bench_excel_import.py [--sizes 1000 10000 100000] [--legacy-max 10000]
+
+Spreadsheets are generated in the layout the importer expects (header on
+the third row). The per-row import is only run up to --legacy-max rows.
+The database is taken from BENCH_DATABASE_URL (defaults to a throwaway
+SQLite file); never point it at a production database.
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = os.environ.get(
+    'BENCH_DATABASE_URL',
+    'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+)
+
+import pandas as pd  # noqa: E402
+from openpyxl import Workbook  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import (Acquisition, AcquisitionStatus, AcquisitionType, MonthlySpending,  # noqa: E402
+                    StatusHistory, User)
+from utils.excel_importer import (import_excel_acquisitions, parse_excel_preview,  # noqa: E402
+                                  _default_category, _default_cost_center)
+from utils.import_mappings import build_mapping  # noqa: E402
+from utils.spreadsheet_reader import inspect_spreadsheet  # noqa: E402
+
+EXCEL_STATUSES = ['Não iniciada', 'Aguardando orçamento', 'Em andamento', 'Concluída', None]
+
+
+def write_spreadsheet(path, rows):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Aquisições')
+    ws.append(['Controle de aquisições'])
+    ws.append([])
+    ws.append(['Nº', 'Descrição', 'Responsável cotação', 'Status'])
+    for n in range(rows):
+        ws.append([n + 1, f'Item de benchmark {n}', 'Compras', random.choice(EXCEL_STATUSES)])
+    wb.save(path)
+
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Título', 'Tipo', 'Valor Estimado', 'Data Solicitação', 'Status'])
+        for n in range(rows):
+            writer.writerow([f'Item CSV de benchmark {n}', random.choice(['Serviço', 'Insumo']),
+                             f'{random.uniform(10, 10000):.2f}'.replace('.', ','), '15/03/2024',
+                             random.choice(EXCEL_STATUSES) or ''])
+
+
+def legacy_import(file_path, user_id):
+    """The importer before the set-based rewrite, kept here as the baseline"""
+    df = pd.read_excel(file_path, header=2)
+    df.columns = ['numero', 'descricao', 'responsavel_cotacao', 'status']
+    df = df.dropna(subset=['numero', 'descricao'])
+    category_id = _default_category().id
+    cost_center_id = _default_cost_center().id
+
+    for index, row in df.iterrows():
+        excel_status = str(row['status']).lower() if pd.notna(row['status']) else 'não iniciada'
+        if 'não iniciada' in excel_status:
+            system_status = AcquisitionStatus.EM_ANALISE
+        elif 'orçamento' in excel_status or 'cotação' in excel_status:
+            system_status = AcquisitionStatus.AGUARDANDO_ORCAMENTO
+        elif 'iniciada' in excel_status or 'andamento' in excel_status:
+            system_status = AcquisitionStatus.EM_COTACAO
+        elif 'concluída' in excel_status or 'finalizada' in excel_status:
+            system_status = AcquisitionStatus.RECEBIDO
+        else:
+            system_status = AcquisitionStatus.EM_ANALISE
+
+        if Acquisition.query.filter_by(title=str(row['descricao'])[:200]).first():
+            continue
+
+        db.session.add(Acquisition(
+            title=str(row['descricao'])[:200],
+            description=f"Importado do Excel: {row['descricao']}",
+            type=AcquisitionType.INSUMO,
+            status=system_status,
+            justification="Importado do arquivo Excel de aquisições",
+            requester_id=user_id,
+            category_id=category_id,
+            cost_center_id=cost_center_id,
+            quantity=1,
+            unit='un'
+        ))
+    db.session.commit()
+
+
+def reset():
+    db.session.execute(delete(StatusHistory))
+    db.session.execute(delete(Acquisition))
+    db.session.execute(delete(MonthlySpending))
+    db.session.commit()
+
+
+def timed(func):
+    """Wall time in seconds"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=10000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    print(f"{'rows':>10} {'read_excel (s)':>14} {'preview (s)':>12} {'per-row (s)':>12} {'set-based (s)':>14} "
+          f"{'csv (s)':>9}")
+    with app.app_context():
+        user_id = User.query.first().id
+        for size in sorted(args.sizes):
+            path = os.path.join(workdir, f'import_{size}.xlsx')
+            write_spreadsheet(path, size)
+            read = timed(lambda: pd.read_excel(path, header=2))
+            preview = timed(lambda: parse_excel_preview(path))
+
+            legacy = None
+            if size <= args.legacy_max:
+                reset()
+                legacy = timed(lambda: legacy_import(path, user_id))
+
+            reset()
+            result = {}
+            current = timed(lambda: result.update(import_excel_acquisitions(path, user_id)))
+            if not result.get('success'):
+                raise SystemExit(f"Import failed: {result.get('error')}")
+
+            csv_path = os.path.join(workdir, f'import_{size}.csv')
+            write_csv(csv_path, size)
+            plan, preview_records = inspect_spreadsheet(csv_path, build_mapping('exportacao_detalhada'), limit=0)
+            reset()
+            result = {}
+            csv_time = timed(lambda: result.update(import_excel_acquisitions(csv_path, user_id, plan)))
+            if not result.get('success') or result['errors']:
+                raise SystemExit(f"CSV import failed: {result.get('error') or result['errors'][:3]}")
+
+            legacy_text = f"{legacy:>12.2f}" if legacy is not None else f"{'-':>12}"
+            print(f"{size:>10} {read:>14.2f} {preview:>12.2f} {legacy_text} {current:>14.2f} {csv_time:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
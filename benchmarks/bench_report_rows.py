@@ -0,0 +1,128 @@
+"""
+Benchmark for the rows behind the report and export pipelines: full
+Acquisition ORM objects with the category, cost center and requester
+joined in (the previous path, labels read through the model properties)
+against the column projection in utils/report_data.py, which yields
+ReportRow namedtuples with their labels already resolved.
+
+Usage:
+    python benchmarks/bench_report_rows.py [--sizes 10000 100000] [--repeat 3]
+
+For each path it reports the time to stream every row through the
+detail_row() formatting, and the peak memory (tracemalloc) of holding all
+of them in a list, as the non-streaming Excel report does; both are also
+scaled to 100k rows. The database is taken from BENCH_DATABASE_URL
+(defaults to a throwaway SQLite file); never point it at a production
+database.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = os.environ.get(
+    'BENCH_DATABASE_URL',
+    'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+)
+
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app import app, db  # noqa: E402
+from models import Acquisition  # noqa: E402
+from utils.excel_generator import detail_row  # noqa: E402
+from utils.report_data import report_rows  # noqa: E402
+from bench_acquisition_queries import fill_acquisitions  # noqa: E402
+
+
+def legacy_detail_row(acquisition):
+    """detail_row() as it was written against ORM objects"""
+    return [
+        acquisition.id,
+        acquisition.title,
+        acquisition.type_display,
+        acquisition.category.name if acquisition.category else '',
+        acquisition.status_display,
+        acquisition.requester.full_name,
+        acquisition.cost_center.name if acquisition.cost_center else '',
+        float(acquisition.estimated_value or 0),
+        float(acquisition.final_value or 0),
+        acquisition.created_at.strftime('%d/%m/%Y'),
+        acquisition.approved_at.strftime('%d/%m/%Y') if acquisition.approved_at else '',
+        acquisition.completed_at.strftime('%d/%m/%Y') if acquisition.completed_at else '',
+        acquisition.justification[:100] + ('...' if len(acquisition.justification) > 100 else ''),
+        acquisition.budget_source.value if acquisition.budget_source else '',
+        acquisition.payment_method.value if acquisition.payment_method else '',
+    ]
+
+
+def orm_rows(batch_size=1000):
+    return Acquisition.query.options(
+        joinedload(Acquisition.category),
+        joinedload(Acquisition.cost_center),
+        joinedload(Acquisition.requester)
+    ).order_by(Acquisition.id).yield_per(batch_size)
+
+
+def projection_rows(batch_size=1000):
+    return report_rows(Acquisition.query.order_by(Acquisition.id), batch_size=batch_size)
+
+
+PATHS = (
+    ('orm', orm_rows, legacy_detail_row),
+    ('projection', projection_rows, detail_row),
+)
+
+
+def stream_time(rows, format_row, repeat):
+    """Median seconds to fetch and format every row"""
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        for row in rows():
+            format_row(row)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def materialized_peak(rows):
+    """Peak MB traced while holding every row in a list"""
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    held = list(rows())
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    db.session.expunge_all()
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'path':>11} {'time (s)':>9} {'s/100k':>8} {'peak (MB)':>10} {'MB/100k':>8}")
+    with app.app_context():
+        for size in sorted(args.sizes):
+            fill_acquisitions(size)
+            rows_count = Acquisition.query.count()
+            scale = 100000 / rows_count
+            for name, rows, format_row in PATHS:
+                seconds = stream_time(rows, format_row, args.repeat)
+                peak = materialized_peak(rows)
+                print(f"{rows_count:>10} {name:>11} {seconds:>9.2f} {seconds * scale:>8.2f} "
+                      f"{peak:>10.1f} {peak * scale:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
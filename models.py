@@ -29,6 +29,23 @@ class AcquisitionStatus(Enum):
     RECEBIDO = 'recebido'
     FECHADO = 'fechado'
 
+# Display labels, shared by the templates and the report generators
+STATUS_LABELS = {
+    AcquisitionStatus.EM_ANALISE: 'Em Análise',
+    AcquisitionStatus.APROVADO: 'Aprovado',
+    AcquisitionStatus.AGUARDANDO_ORCAMENTO: 'Aguardando Orçamento',
+    AcquisitionStatus.EM_COTACAO: 'Em Cotação',
+    AcquisitionStatus.ORCAMENTO_RECEBIDO: 'Orçamento Recebido',
+    AcquisitionStatus.PEDIDO_REALIZADO: 'Pedido Realizado',
+    AcquisitionStatus.RECEBIDO: 'Recebido/Concluído',
+    AcquisitionStatus.FECHADO: 'Fechado'
+}
+
+TYPE_LABELS = {
+    AcquisitionType.SERVICO: 'Serviço',
+    AcquisitionType.INSUMO: 'Insumo',
+}
+
 # Payment methods enum
 class PaymentMethod(Enum):
     DINHEIRO = 'dinheiro'
@@ -45,6 +62,11 @@ class BudgetSource(Enum):
     FEDERAL = 'federal'
     OUTROS = 'outros'
 
+def format_full_name(first_name, last_name, email=None):
+    if first_name and last_name:
+        return f"{first_name} {last_name}"
+    return first_name or last_name or email or "Usuário"
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -58,6 +80,7 @@ class User(UserMixin, db.Model):
     approved = db.Column(db.Boolean, default=False)  # Admin approval required
     approved_by_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=True)
     approved_at = db.Column(db.DateTime, nullable=True)
+    notification_mode = db.Column(db.String(20), default='immediate')  # immediate, digest (see utils/notifications.py)
 
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
@@ -70,9 +93,7 @@ class User(UserMixin, db.Model):
 
     @property
     def full_name(self):
-        if self.first_name and self.last_name:
-            return f"{self.first_name} {self.last_name}"
-        return self.first_name or self.last_name or self.email or "Usuário"
+        return format_full_name(self.first_name, self.last_name, self.email)
 
     def can_approve(self):
         return self.role in [UserRole.ADMIN, UserRole.APROVADOR]
@@ -82,6 +103,9 @@ class User(UserMixin, db.Model):
 
     def is_admin(self):
         return self.role == UserRole.ADMIN
+
+    def wants_digest(self):
+        return self.notification_mode == 'digest'
     
     def set_password(self, password):
         """Set password hash"""
@@ -145,6 +169,20 @@ class Category(db.Model):
 
 class Acquisition(db.Model):
     __tablename__ = 'acquisitions'
+    __table_args__ = (
+        # Listing is always ordered by created_at desc; (created_at, id) also serves date ranges
+        db.Index('ix_acquisitions_created_at_id', 'created_at', 'id'),
+        # Filtered listings and report date ranges per type/status/category/requester/cost center
+        db.Index('ix_acquisitions_type_created_at', 'type', 'created_at'),
+        db.Index('ix_acquisitions_status_created_at', 'status', 'created_at'),
+        db.Index('ix_acquisitions_category_created_at', 'category_id', 'created_at'),
+        db.Index('ix_acquisitions_requester_created_at', 'requester_id', 'created_at'),
+        db.Index('ix_acquisitions_cost_center_created_at', 'cost_center_id', 'created_at'),
+        # Covers the dashboard status/type counts without touching the heap
+        db.Index('ix_acquisitions_status_type', 'status', 'type'),
+        # Incremental exports (updated_since)
+        db.Index('ix_acquisitions_updated_at_id', 'updated_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     
     # Basic info
@@ -190,21 +228,11 @@ class Acquisition(db.Model):
 
     @property
     def status_display(self):
-        status_map = {
-            AcquisitionStatus.EM_ANALISE: 'Em Análise',
-            AcquisitionStatus.APROVADO: 'Aprovado',
-            AcquisitionStatus.AGUARDANDO_ORCAMENTO: 'Aguardando Orçamento',
-            AcquisitionStatus.EM_COTACAO: 'Em Cotação',
-            AcquisitionStatus.ORCAMENTO_RECEBIDO: 'Orçamento Recebido',
-            AcquisitionStatus.PEDIDO_REALIZADO: 'Pedido Realizado',
-            AcquisitionStatus.RECEBIDO: 'Recebido/Concluído',
-            AcquisitionStatus.FECHADO: 'Fechado'
-        }
-        return status_map.get(self.status, self.status.value)
+        return STATUS_LABELS.get(self.status, self.status.value)
 
     @property
     def type_display(self):
-        return 'Serviço' if self.type == AcquisitionType.SERVICO else 'Insumo'
+        return TYPE_LABELS.get(self.type, 'Insumo')
 
     @property
     def days_since_creation(self):
@@ -212,6 +240,9 @@ class Acquisition(db.Model):
 
 class StatusHistory(db.Model):
     __tablename__ = 'status_history'
+    __table_args__ = (
+        db.Index('ix_status_history_acquisition_created_at', 'acquisition_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     
     acquisition_id = db.Column(db.Integer, db.ForeignKey('acquisitions.id'), nullable=False)
@@ -225,6 +256,9 @@ class StatusHistory(db.Model):
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_acquisition_id', 'acquisition_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     
     acquisition_id = db.Column(db.Integer, db.ForeignKey('acquisitions.id'), nullable=False)
@@ -241,3 +275,96 @@ class Document(db.Model):
     
     # Relationships
     uploaded_by = db.relationship('User', backref='uploaded_documents')
+
+# Monthly spending rollup, maintained on write by utils.spending_rollup
+class MonthlySpending(db.Model):
+    __tablename__ = 'monthly_spending'
+    __table_args__ = (
+        UniqueConstraint('year', 'month', 'type', 'cost_center_id', name='uq_monthly_spending_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    type = db.Column(db.Enum(AcquisitionType), nullable=False)
+    cost_center_id = db.Column(db.Integer, db.ForeignKey('cost_centers.id'), nullable=False)
+    
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_final = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    sum_estimated = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    
+    # Relationships
+    cost_center = db.relationship('CostCenter')
+
+# Report generation jobs run by utils.report_jobs
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        db.Index('ix_report_jobs_dedup_key_status', 'dedup_key', 'status'),
+    )
+    id = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    
+    kind = db.Column(db.String(20), nullable=False)  # pdf, pdf_full, excel
+    params = db.Column(db.Text)  # JSON
+    dedup_key = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    file_path = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    
+    requested_by_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class ImportRun(db.Model):
+    __tablename__ = 'import_runs'
+    id = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    
+    file_path = db.Column(db.String(500), nullable=False)
+    column_mapping = db.Column(db.Text)  # JSON import plan built by the preview (see utils/spreadsheet_reader.py)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    
+    # Progress; rows_done is the number of spreadsheet rows committed so far (resume point)
+    total_rows = db.Column(db.Integer)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    rows_imported = db.Column(db.Integer, nullable=False, default=0)
+    rows_skipped = db.Column(db.Integer, nullable=False, default=0)
+    rows_failed = db.Column(db.Integer, nullable=False, default=0)
+    row_errors = db.Column(db.Text)  # JSON list of {"row": ..., "error": ...}
+    error = db.Column(db.Text)
+    
+    requested_by_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+class NotificationEvent(db.Model):
+    """Outbox of notifications for users who receive a daily digest instead of one email per event"""
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        # The digest job reads the unsent events grouped by recipient
+        db.Index('ix_notification_outbox_sent_at_recipient', 'sent_at', 'recipient_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    
+    recipient_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
+    acquisition_id = db.Column(db.Integer, db.ForeignKey('acquisitions.id'), nullable=False)
+    kind = db.Column(db.String(30), nullable=False)  # approval_request, status_change
+    new_status = db.Column(db.Enum(AcquisitionStatus))
+    
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    sent_at = db.Column(db.DateTime)
+    
+    recipient = db.relationship('User')
+    acquisition = db.relationship('Acquisition')
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.now)
@@ -18,13 +18,14 @@ from werkzeug.local import LocalProxy
 
 from app import app, db
 from models import OAuth, User
+from utils.user_cache import user_cache
 
 login_manager = LoginManager(app)
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    return user_cache.load(user_id)
 
 
 class UserSessionStorage(BaseStorage):
@@ -1,23 +1,50 @@
 import os
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, session
+from flask import (render_template, request, redirect, url_for, flash, jsonify, send_file, session,
+                   Response, stream_with_context)
 from flask_login import current_user, login_required
-from sqlalchemy import func, and_, or_
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 
 from app import app, db
-from models import (User, Acquisition, Category, CostCenter, StatusHistory, Document, 
-                   AcquisitionType, AcquisitionStatus, UserRole, PaymentMethod, BudgetSource)
+from models import (User, Acquisition, Category, CostCenter, StatusHistory, Document, ReportJob, ImportRun,
+                   AcquisitionType, AcquisitionStatus, UserRole, PaymentMethod, BudgetSource,
+                   STATUS_LABELS, TYPE_LABELS)
 from utils.pdf_generator import generate_report_pdf
-from utils.excel_generator import generate_excel_report
-from utils.excel_importer import import_excel_acquisitions, parse_excel_preview
+from utils.excel_generator import generate_excel_report, stream_excel_report
+from utils.excel_importer import parse_excel_preview
+from utils.dashboard_stats import get_dashboard_stats
+from utils.spending_rollup import (rollup_snapshot, record_created, record_changed,
+                                   monthly_totals, type_totals, cost_center_totals)
+from utils.cache import response_cache
+from utils.user_cache import user_cache
+from utils.query_counter import query_counter
+from utils.request_profiler import request_profiler
+from utils.pagination import keyset_paginate, approximate_count
+from utils.search import apply_search
+from utils.report_filters import (parse_report_filters, apply_report_filters, report_filter_args,
+                                  describe_report_filters)
+from utils.report_data import report_summary
+from utils.data_export import csv_chunks, ndjson_chunks, encode_chunks
+from utils.report_jobs import report_jobs, job_status, REPORT_BUILDERS
+from utils.artifact_store import artifact_store
+from utils.report_charts import chart_cache
+from utils.import_runs import import_runs, import_run_status
+from utils.import_mappings import build_mapping, IMPORT_LAYOUTS, IMPORT_FIELDS, DEFAULT_LAYOUT
+from utils.notifications import notify_approval_request, notify_status_change, NOTIFICATION_MODES
+
+# Result sets larger than this are listed with keyset (cursor) pagination
+KEYSET_PAGINATION_THRESHOLD = 1000
 
 # Make session permanent
 @app.before_request
 def make_session_permanent():
     session.permanent = True
 
+@app.context_processor
+def inject_notification_modes():
+    return {'NOTIFICATION_MODES': NOTIFICATION_MODES}
+
 @app.route('/')
 def index():
     if current_user.is_authenticated:
@@ -27,12 +54,10 @@ def index():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Get statistics for dashboard
-    total_acquisitions = Acquisition.query.count()
-    servicos_count = Acquisition.query.filter_by(type=AcquisitionType.SERVICO).count()
-    insumos_count = Acquisition.query.filter_by(type=AcquisitionType.INSUMO).count()
+    role = current_user.role.value
     
-    pending_approvals = Acquisition.query.filter_by(status=AcquisitionStatus.EM_ANALISE).count()
+    # Cards and status chart come from a single grouped query
+    stats = response_cache.get_or_compute('dashboard_stats', get_dashboard_stats, role=role)
     
     # Recent acquisitions
     recent_acquisitions = Acquisition.query.options(
@@ -40,34 +65,19 @@ def dashboard():
         joinedload(Acquisition.requester)
     ).order_by(Acquisition.created_at.desc()).limit(5).all()
     
-    # Monthly spending data for chart
+    # Monthly spending data for chart, read from the rollup table
     current_year = datetime.now().year
-    monthly_data = db.session.query(
-        func.extract('month', Acquisition.created_at).label('month'),
-        Acquisition.type,
-        func.sum(Acquisition.final_value).label('total')
-    ).filter(
-        func.extract('year', Acquisition.created_at) == current_year,
-        Acquisition.final_value.isnot(None)
-    ).group_by(
-        func.extract('month', Acquisition.created_at),
-        Acquisition.type
-    ).all()
-    
-    # Status distribution
-    status_data = db.session.query(
-        Acquisition.status,
-        func.count(Acquisition.id).label('count')
-    ).group_by(Acquisition.status).all()
+    monthly_data = response_cache.get_or_compute(
+        'dashboard_monthly',
+        lambda: [tuple(row) for row in monthly_totals(current_year)],
+        role=role,
+        filters={'year': current_year}
+    )
     
     return render_template('dashboard.html',
-                         total_acquisitions=total_acquisitions,
-                         servicos_count=servicos_count,
-                         insumos_count=insumos_count,
-                         pending_approvals=pending_approvals,
+                         stats=stats,
                          recent_acquisitions=recent_acquisitions,
-                         monthly_data=monthly_data,
-                         status_data=status_data)
+                         monthly_data=monthly_data)
 
 @app.route('/acquisitions/new')
 @login_required
@@ -114,7 +124,11 @@ def create_acquisition():
         status_history.new_status = AcquisitionStatus.EM_ANALISE
         status_history.comment = "Solicitação criada"
         db.session.add(status_history)
+        
+        record_created([acquisition])
         db.session.commit()
+        response_cache.bump_version()
+        notify_approval_request(acquisition)
         
         flash('Solicitação criada com sucesso!', 'success')
         return redirect(url_for('acquisition_detail', id=acquisition.id))
@@ -124,14 +138,8 @@ def create_acquisition():
         flash(f'Erro ao criar solicitação: {str(e)}', 'error')
         return redirect(url_for('new_acquisition'))
 
-@app.route('/acquisitions')
-@login_required
-def list_acquisitions():
-    page = request.args.get('page', 1, type=int)
-    type_filter = request.args.get('type')
-    status_filter = request.args.get('status')
-    category_filter = request.args.get('category_id', type=int)
-    
+def filtered_acquisitions_query(type_filter=None, status_filter=None, category_filter=None):
+    """Acquisition query with the list filters and role-based visibility applied"""
     query = Acquisition.query.options(
         joinedload(Acquisition.category),
         joinedload(Acquisition.cost_center),
@@ -151,20 +159,91 @@ def list_acquisitions():
         if current_user.role == UserRole.SOLICITANTE:
             query = query.filter(Acquisition.requester_id == current_user.id)
     
-    acquisitions = query.order_by(Acquisition.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    return query
+
+@app.route('/acquisitions')
+@login_required
+def list_acquisitions():
+    page = request.args.get('page', 1, type=int)
+    type_filter = request.args.get('type')
+    status_filter = request.args.get('status')
+    category_filter = request.args.get('category_id', type=int)
+    search_text = request.args.get('q', '').strip()
+    
+    query = filtered_acquisitions_query(type_filter, status_filter, category_filter)
+    
+    keyset = False
+    if search_text:
+        # Ranked search results are always listed with page numbers
+        acquisitions = apply_search(query, search_text).paginate(page=page, per_page=20, error_out=False)
+    else:
+        # Cursor mode for large result sets, page numbers for small ones
+        cursor = request.args.get('cursor')
+        keyset = bool(cursor)
+        total = None
+        if not keyset and 'page' not in request.args:
+            total = approximate_count(query)
+            keyset = total is None or total > KEYSET_PAGINATION_THRESHOLD
+        
+        if keyset:
+            try:
+                acquisitions = keyset_paginate(query, Acquisition, cursor=cursor, per_page=20, total=total)
+            except ValueError:
+                flash('Link de paginação inválido.', 'error')
+                return redirect(url_for('list_acquisitions'))
+        else:
+            acquisitions = query.order_by(Acquisition.created_at.desc(), Acquisition.id.desc()).paginate(
+                page=page, per_page=20, error_out=False
+            )
     
     categories = Category.query.filter_by(active=True).all()
     
     return render_template('acquisition/list.html',
                          acquisitions=acquisitions,
+                         keyset=keyset,
                          categories=categories,
                          AcquisitionType=AcquisitionType,
                          AcquisitionStatus=AcquisitionStatus,
                          type_filter=type_filter,
                          status_filter=status_filter,
-                         category_filter=category_filter)
+                         category_filter=category_filter,
+                         search_text=search_text)
+
+@app.route('/acquisitions/search')
+@login_required
+def search_acquisitions():
+    search_text = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    
+    if not search_text:
+        return jsonify({'error': 'Informe um termo de busca.'}), 400
+    
+    query = filtered_acquisitions_query(
+        request.args.get('type'),
+        request.args.get('status'),
+        request.args.get('category_id', type=int)
+    )
+    
+    # One extra row tells whether there is a next page without counting all matches
+    rows = apply_search(query, search_text).offset((page - 1) * per_page).limit(per_page + 1).all()
+    
+    return jsonify({
+        'query': search_text,
+        'page': page,
+        'per_page': per_page,
+        'has_next': len(rows) > per_page,
+        'results': [{
+            'id': acquisition.id,
+            'title': acquisition.title,
+            'type': acquisition.type_display,
+            'status': acquisition.status_display,
+            'category': acquisition.category.name if acquisition.category else None,
+            'requester': acquisition.requester.full_name,
+            'created_at': acquisition.created_at.isoformat(),
+            'url': url_for('acquisition_detail', id=acquisition.id),
+        } for acquisition in rows[:per_page]]
+    })
 
 @app.route('/acquisitions/<int:id>')
 @login_required
@@ -174,8 +253,9 @@ def acquisition_detail(id):
         joinedload(Acquisition.cost_center),
         joinedload(Acquisition.requester),
         joinedload(Acquisition.approver),
-        joinedload(Acquisition.status_history),
-        joinedload(Acquisition.documents)
+        # Collections in their own queries (no history x documents row product), with their users
+        selectinload(Acquisition.status_history).joinedload(StatusHistory.user),
+        selectinload(Acquisition.documents).joinedload(Document.uploaded_by)
     ).get_or_404(id)
     
     # Check access permissions
@@ -213,6 +293,7 @@ def update_acquisition_status(id):
     
     try:
         old_status = acquisition.status
+        snapshot = rollup_snapshot(acquisition)
         acquisition.status = new_status
         
         # Update specific timestamps and fields
@@ -249,7 +330,10 @@ def update_acquisition_status(id):
         status_history.comment = comment
         
         db.session.add(status_history)
+        record_changed(snapshot, acquisition)
         db.session.commit()
+        response_cache.bump_version()
+        notify_status_change(acquisition, current_user)
         
         flash('Status atualizado com sucesso!', 'success')
         
@@ -308,62 +392,95 @@ def upload_document(id):
     
     return redirect(url_for('acquisition_detail', id=id))
 
+def get_reports_data(current_year, filters=None):
+    """Aggregates shown on the reports page.
+
+    Without filters they are read from the spending rollup; the rollup has
+    no status, category or requester dimension, so filtered pages aggregate
+    the matching acquisitions instead (through the indexed filter predicates).
+    """
+    if filters:
+        summary = report_summary(apply_report_filters(Acquisition.query, filters))
+        servicos_value = summary.by_type[AcquisitionType.SERVICO][1]
+        insumos_value = summary.by_type[AcquisitionType.INSUMO][1]
+        return {
+            'total_value': summary.value,
+            'servicos_value': servicos_value,
+            'insumos_value': insumos_value,
+            'monthly_data': [(month, acquisition_type, value, count)
+                             for year, month, acquisition_type, count, value in summary.by_month
+                             if year == current_year],
+            'cost_center_data': [(name, value, count) for name, count, value in summary.by_cost_center],
+        }
+    
+    totals_by_type = type_totals()
+    servicos_value = totals_by_type.get(AcquisitionType.SERVICO, 0)
+    insumos_value = totals_by_type.get(AcquisitionType.INSUMO, 0)
+    
+    return {
+        'total_value': servicos_value + insumos_value,
+        'servicos_value': servicos_value,
+        'insumos_value': insumos_value,
+        'monthly_data': [tuple(row) for row in monthly_totals(current_year)],
+        'cost_center_data': [tuple(row) for row in cost_center_totals()],
+    }
+
 @app.route('/reports')
 @login_required
 def reports():
-    # Summary statistics
-    total_value = db.session.query(func.sum(Acquisition.final_value)).scalar() or 0
-    servicos_value = db.session.query(func.sum(Acquisition.final_value)).filter(
-        Acquisition.type == AcquisitionType.SERVICO
-    ).scalar() or 0
-    insumos_value = db.session.query(func.sum(Acquisition.final_value)).filter(
-        Acquisition.type == AcquisitionType.INSUMO
-    ).scalar() or 0
-    
-    # Monthly data for current year
-    current_year = datetime.now().year
-    monthly_data = db.session.query(
-        func.extract('month', Acquisition.created_at).label('month'),
-        Acquisition.type,
-        func.sum(Acquisition.final_value).label('total'),
-        func.count(Acquisition.id).label('count')
-    ).filter(
-        func.extract('year', Acquisition.created_at) == current_year,
-        Acquisition.final_value.isnot(None)
-    ).group_by(
-        func.extract('month', Acquisition.created_at),
-        Acquisition.type
-    ).all()
-    
-    # Cost center breakdown
-    cost_center_data = db.session.query(
-        CostCenter.name,
-        func.sum(Acquisition.final_value).label('total'),
-        func.count(Acquisition.id).label('count')
-    ).join(Acquisition).filter(
-        Acquisition.final_value.isnot(None)
-    ).group_by(CostCenter.name).all()
+    try:
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        filters = {}
+    
+    # The monthly table and chart show one year: the end of the filtered period, or the current year
+    period_end = filters.get('date_to') or filters.get('date_from')
+    current_year = period_end.year if period_end else datetime.now().year
+    filter_args = report_filter_args(filters)
+    data = response_cache.get_or_compute(
+        'reports',
+        lambda: get_reports_data(current_year, filters),
+        role=current_user.role.value,
+        filters={'year': current_year, **filter_args}
+    )
     
     return render_template('reports/index.html',
-                         total_value=total_value,
-                         servicos_value=servicos_value,
-                         insumos_value=insumos_value,
-                         monthly_data=monthly_data,
-                         cost_center_data=cost_center_data)
+                         current_year=current_year,
+                         filters=filters,
+                         filter_args=filter_args,
+                         filters_description=describe_report_filters(filters),
+                         cost_centers=CostCenter.query.order_by(CostCenter.name).all(),
+                         categories=Category.query.order_by(Category.name).all(),
+                         requesters=User.query.filter_by(approved=True).order_by(User.first_name, User.last_name).all(),
+                         acquisition_types=TYPE_LABELS,
+                         acquisition_statuses=STATUS_LABELS,
+                         **data)
+
+def send_artifact(file_path, download_name):
+    """Send a generated file and delete it once the response has been sent"""
+    # send_file responses skip call_on_close callbacks, so the file is unlinked
+    # right away and served from the open handle, which the server closes
+    artifact = open(file_path, 'rb')
+    artifact_store.release(file_path)
+    return send_file(artifact, as_attachment=True, download_name=download_name)
 
 @app.route('/reports/export-pdf')
 @login_required
 def export_pdf_report():
     try:
-        # Get filtered data
-        acquisitions = Acquisition.query.options(
-            joinedload(Acquisition.category),
-            joinedload(Acquisition.cost_center),
-            joinedload(Acquisition.requester)
-        ).all()
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('reports'))
+    
+    try:
+        query = apply_report_filters(Acquisition.query, filters)
         
-        pdf_file = generate_report_pdf(acquisitions)
-        return send_file(pdf_file, as_attachment=True, download_name='relatorio_aquisicoes.pdf')
+        # detail=full lists every acquisition instead of the first ones
+        pdf_file = generate_report_pdf(query, full_detail=request.args.get('detail') == 'full',
+                                       filters_description=describe_report_filters(filters))
+        return send_artifact(pdf_file, 'relatorio_aquisicoes.pdf')
         
     except Exception as e:
         flash(f'Erro ao gerar relatório PDF: {str(e)}', 'error')
@@ -373,20 +490,120 @@ def export_pdf_report():
 @login_required
 def export_excel_report():
     try:
-        # Get filtered data
-        acquisitions = Acquisition.query.options(
-            joinedload(Acquisition.category),
-            joinedload(Acquisition.cost_center),
-            joinedload(Acquisition.requester)
-        ).all()
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('reports'))
+    
+    try:
+        query = apply_report_filters(Acquisition.query, filters)
+        filters_description = describe_report_filters(filters)
+        
+        # Streaming mode: rows fetched in batches into write-only sheets (flat memory); the finished
+        # file is then sent in chunks, so the download only starts once the workbook is complete
+        if request.args.get('mode') == 'stream':
+            return Response(
+                stream_with_context(stream_excel_report(query.order_by(Acquisition.id), filters_description)),
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                headers={'Content-Disposition': 'attachment; filename=relatorio_aquisicoes.xlsx'}
+            )
         
-        excel_file = generate_excel_report(acquisitions)
-        return send_file(excel_file, as_attachment=True, download_name='relatorio_aquisicoes.xlsx')
+        excel_file = generate_excel_report(query, filters_description)
+        return send_artifact(excel_file, 'relatorio_aquisicoes.xlsx')
         
     except Exception as e:
         flash(f'Erro ao gerar relatório Excel: {str(e)}', 'error')
         return redirect(url_for('reports'))
 
+@app.route('/reports/jobs', methods=['POST'])
+@login_required
+def submit_report_job():
+    args = request.form or request.get_json(silent=True) or {}
+    kind = args.get('kind')
+    
+    try:
+        # Jobs keep the filters in their query-string form, which also makes them part of the dedup key
+        params = report_filter_args(parse_report_filters(args))
+        job = report_jobs.submit(kind, params, current_user.id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = job_status(job)
+    response['status_url'] = url_for('report_job_status', job_id=job.id)
+    response['download_url'] = url_for('download_report_job', job_id=job.id)
+    return jsonify(response), 202
+
+@app.route('/reports/jobs/<string:job_id>')
+@login_required
+def report_job_status(job_id):
+    job = report_jobs.fail_if_stale(db.get_or_404(ReportJob, job_id))
+    return jsonify(job_status(job))
+
+@app.route('/reports/jobs/<string:job_id>/download')
+@login_required
+def download_report_job(job_id):
+    job = db.get_or_404(ReportJob, job_id)
+    
+    if job.status != 'done' or not job.file_path or not os.path.exists(job.file_path):
+        flash('Relatório ainda não está disponível.', 'warning')
+        return redirect(url_for('reports'))
+    
+    builder, filename = REPORT_BUILDERS[job.kind]
+    return send_file(job.file_path, as_attachment=True, download_name=filename)
+
+@app.route('/reports/export-data')
+@login_required
+def export_data():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Formato deve ser csv ou ndjson.'}), 400
+    
+    try:
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = apply_report_filters(Acquisition.query, filters)
+    
+    # Incremental pulls read in change order; the last row's updated_at column is the consumer's next updated_since
+    if 'updated_since' in filters:
+        query = query.order_by(Acquisition.updated_at, Acquisition.id)
+    else:
+        query = query.order_by(Acquisition.id)
+    
+    if export_format == 'csv':
+        chunks = csv_chunks(query)
+        mimetype = 'text/csv'
+    else:
+        chunks = ndjson_chunks(query)
+        mimetype = 'application/x-ndjson'
+    
+    filename = f'aquisicoes.{export_format}'
+    compress = request.args.get('gzip') in ('1', 'true')
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(
+        stream_with_context(encode_chunks(chunks, compress)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/account/notifications', methods=['POST'])
+@login_required
+def update_notification_mode():
+    mode = request.form.get('mode')
+    if mode not in NOTIFICATION_MODES:
+        flash('Preferência de notificação inválida.', 'error')
+        return redirect(request.referrer or url_for('dashboard'))
+    
+    current_user.notification_mode = mode
+    db.session.commit()
+    user_cache.invalidate(current_user.id)
+    flash(f'Notificações por e-mail: {NOTIFICATION_MODES[mode]}.', 'success')
+    return redirect(request.referrer or url_for('dashboard'))
+
 @app.route('/admin/users')
 @login_required
 def admin_users():
@@ -409,7 +626,10 @@ def update_user_role(user_id):
     
     try:
         user.role = new_role
+        if 'active' in request.form:
+            user.active = request.form['active'] == '1'
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash(f'Perfil do usuário {user.full_name} atualizado para {new_role.value}!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -417,6 +637,53 @@ def update_user_role(user_id):
     
     return redirect(url_for('admin_users'))
 
+@app.route('/admin/cache-stats')
+@login_required
+def admin_cache_stats():
+    if not current_user.is_admin():
+        return jsonify({'error': 'Acesso negado.'}), 403
+    return jsonify(response_cache.stats())
+
+@app.route('/admin/query-stats')
+@login_required
+def admin_query_stats():
+    if not current_user.is_admin():
+        return jsonify({'error': 'Acesso negado.'}), 403
+    return jsonify(query_counter.stats())
+
+@app.route('/admin/user-cache-stats')
+@login_required
+def admin_user_cache_stats():
+    if not current_user.is_admin():
+        return jsonify({'error': 'Acesso negado.'}), 403
+    return jsonify(user_cache.stats())
+
+@app.route('/admin/artifact-stats')
+@login_required
+def admin_artifact_stats():
+    if not current_user.is_admin():
+        return jsonify({'error': 'Acesso negado.'}), 403
+    return jsonify(artifact_store.stats())
+
+@app.route('/admin/chart-cache-stats')
+@login_required
+def admin_chart_cache_stats():
+    if not current_user.is_admin():
+        return jsonify({'error': 'Acesso negado.'}), 403
+    return jsonify(chart_cache.stats())
+
+@app.route('/admin/performance')
+@login_required
+def admin_performance():
+    if not current_user.is_admin():
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    stats = request_profiler.stats()
+    if request.args.get('format') == 'json':
+        return jsonify(stats)
+    return render_template('admin/performance.html', stats=stats, n_plus_one=query_counter.stats())
+
 @app.route('/admin/panel')
 @login_required
 def admin_panel():
@@ -499,7 +766,10 @@ def import_excel_page():
     if not current_user.is_admin():
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard'))
-    return render_template('admin/import_excel.html')
+    return render_template('admin/import_excel.html',
+                         layouts=IMPORT_LAYOUTS,
+                         default_layout=DEFAULT_LAYOUT,
+                         fields=IMPORT_FIELDS)
 
 @app.route('/admin/import-excel/upload', methods=['POST'])
 @login_required
@@ -517,30 +787,42 @@ def upload_excel_import():
         flash('Nenhum arquivo selecionado.', 'error')
         return redirect(url_for('import_excel_page'))
     
-    if file and file.filename.endswith(('.xlsx', '.xls')):
+    extension = os.path.splitext(file.filename)[1].lower()
+    if file and extension in ('.xlsx', '.xls', '.csv'):
         try:
-            # Save temporary file
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                file.save(tmp_file.name)
+            mapping = build_mapping(request.form.get('layout'), request.form.get('mapping_json'))
+            
+            # Save temporary file (a previous, unconfirmed upload is discarded)
+            session.pop('import_plan', None)
+            previous_path = session.pop('import_file_path', None)
+            if previous_path:
+                artifact_store.release(previous_path)
+            
+            tmp_path = artifact_store.new_path(extension, prefix='import_')
+            # Stays pinned until the import run releases it (kept on failure for resume)
+            file.save(tmp_path)
+            
+            # Preview the file
+            preview_result = parse_excel_preview(tmp_path, mapping)
+            
+            if preview_result['success']:
+                # Store file path and import plan in session for import
+                session['import_file_path'] = tmp_path
+                session['import_plan'] = preview_result['plan']
                 
-                # Preview the file
-                preview_result = parse_excel_preview(tmp_file.name)
+                return render_template('admin/import_preview.html', 
+                                     preview=preview_result['preview'],
+                                     total_rows=preview_result['total_rows'],
+                                     plan=preview_result['plan'],
+                                     fields=IMPORT_FIELDS)
+            else:
+                artifact_store.release(tmp_path)
+                flash(f'Erro ao processar arquivo: {preview_result["error"]}', 'error')
                 
-                if preview_result['success']:
-                    # Store file path in session for import
-                    session['import_file_path'] = tmp_file.name
-                    
-                    return render_template('admin/import_preview.html', 
-                                         preview=preview_result['preview'],
-                                         total_rows=preview_result['total_rows'])
-                else:
-                    flash(f'Erro ao processar arquivo: {preview_result["error"]}', 'error')
-                    
         except Exception as e:
             flash(f'Erro ao processar arquivo: {str(e)}', 'error')
     else:
-        flash('Arquivo deve ser .xlsx ou .xls', 'error')
+        flash('Arquivo deve ser .xlsx, .xls ou .csv', 'error')
     
     return redirect(url_for('import_excel_page'))
 
@@ -556,26 +838,50 @@ def confirm_excel_import():
         flash('Arquivo não encontrado. Tente novamente.', 'error')
         return redirect(url_for('import_excel_page'))
     
+    # The file now belongs to the import run, which removes it when done
+    run = import_runs.submit(file_path, current_user.id, session.get('import_plan'))
+    session.pop('import_file_path', None)
+    session.pop('import_plan', None)
+    
+    return redirect(url_for('import_run_page', run_id=run.id))
+
+@app.route('/admin/import-excel/runs/<string:run_id>')
+@login_required
+def import_run_page(run_id):
+    if not current_user.is_admin():
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    run = db.get_or_404(ImportRun, run_id)
+    return render_template('admin/import_run.html',
+                         run=run,
+                         status=import_run_status(run),
+                         can_resume=import_runs.can_resume(run))
+
+@app.route('/admin/import-excel/runs/<string:run_id>/status')
+@login_required
+def import_run_progress(run_id):
+    if not current_user.is_admin():
+        return jsonify({'error': 'Acesso negado.'}), 403
+    
+    run = db.get_or_404(ImportRun, run_id)
+    return jsonify(import_run_status(run))
+
+@app.route('/admin/import-excel/runs/<string:run_id>/resume', methods=['POST'])
+@login_required
+def resume_import_run(run_id):
+    if not current_user.is_admin():
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard'))
+    
+    run = db.get_or_404(ImportRun, run_id)
     try:
-        result = import_excel_acquisitions(file_path, current_user.id)
-        
-        if result['success']:
-            flash(f'Importação concluída! {result["imported_count"]} aquisições importadas.', 'success')
-            if result['errors']:
-                flash(f'Alguns erros ocorreram: {", ".join(result["errors"][:3])}', 'warning')
-        else:
-            flash(f'Erro na importação: {result["error"]}', 'error')
-            
-        # Clean up
-        import os
-        if os.path.exists(file_path):
-            os.unlink(file_path)
-        session.pop('import_file_path', None)
-        
-    except Exception as e:
-        flash(f'Erro na importação: {str(e)}', 'error')
+        import_runs.resume(run)
+        flash('Importação retomada.', 'success')
+    except ValueError as e:
+        flash(str(e), 'error')
     
-    return redirect(url_for('list_acquisitions'))
+    return redirect(url_for('import_run_page', run_id=run.id))
 
 # Budget management routes
 @app.route('/acquisitions/<int:id>/budget', methods=['POST'])
@@ -627,6 +933,7 @@ def update_budget(id):
             db.session.add(status_history)
         
         db.session.commit()
+        response_cache.bump_version()
         flash('Informações do orçamento atualizadas com sucesso!', 'success')
         
     except Exception as e:
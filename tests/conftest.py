@@ -0,0 +1,33 @@
+"""
+Test setup: the app reads DATABASE_URL when app.py is imported, so it is
+pointed at a throwaway SQLite file before anything imports it. Each test
+gets an application context and an empty acquisitions table.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ.setdefault('REQUEST_PROFILING', '0')
+
+from app import app as flask_app, db  # noqa: E402
+from models import Acquisition, ImportRun, MonthlySpending, ReportJob, StatusHistory  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+        ImportRun.query.delete()
+        ReportJob.query.delete()
+        StatusHistory.query.delete()
+        MonthlySpending.query.delete()
+        Acquisition.query.delete()
+        db.session.commit()
+        db.session.remove()
@@ -0,0 +1,52 @@
+import os
+import time
+
+from utils.artifact_store import ArtifactStore, PIN_SUFFIX, SIZE_EVICTION_GRACE
+
+
+def write_artifact(store, size, age):
+    """A completed, unpinned file of size bytes last written age seconds ago"""
+    path = store.new_path('.bin')
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    store.mark_complete(path)
+    past = time.time() - age
+    os.utime(path, (past, past))
+    return path
+
+
+def test_pin_held_by_one_store_survives_size_eviction_by_another(tmp_path):
+    holder = ArtifactStore(str(tmp_path), max_bytes=1000, max_age_seconds=3600)
+    evictor = ArtifactStore(str(tmp_path), max_bytes=1000, max_age_seconds=3600)
+
+    pinned = write_artifact(holder, 800, SIZE_EVICTION_GRACE + 300)
+    holder.pin(pinned)
+    older = write_artifact(evictor, 800, SIZE_EVICTION_GRACE + 200)
+    newer = write_artifact(evictor, 800, SIZE_EVICTION_GRACE + 100)
+
+    evictor.evict()
+
+    assert os.path.exists(pinned)
+    assert not os.path.exists(older)
+    assert not os.path.exists(newer)
+    assert evictor.stats()['pinned_files'] == 1
+
+
+def test_pinned_file_is_removed_by_age(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=1000, max_age_seconds=3600)
+    path = write_artifact(store, 10, 7200)
+    store.pin(path)
+
+    ArtifactStore(str(tmp_path), max_bytes=1000, max_age_seconds=3600).evict()
+
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + PIN_SUFFIX)
+
+
+def test_release_removes_file_and_pin(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_bytes=1000, max_age_seconds=3600)
+    path = store.new_path('.xlsx', prefix='import_')
+
+    store.release(path)
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,59 @@
+from sqlalchemy import insert
+
+from app import db
+from models import Acquisition, AcquisitionStatus, AcquisitionType, Category, CostCenter, User
+from utils.dashboard_stats import get_dashboard_stats
+from utils.query_counter import count_queries
+
+
+def seed_acquisitions(rows):
+    """Insert (type, status) acquisitions for the seeded admin, category and cost center"""
+    requester_id = User.query.first().id
+    category_id = Category.query.first().id
+    cost_center_id = CostCenter.query.first().id
+    db.session.execute(insert(Acquisition), [
+        {
+            'title': f'Aquisição {n}',
+            'description': 'Teste',
+            'justification': 'Teste',
+            'type': acquisition_type,
+            'status': status,
+            'requester_id': requester_id,
+            'category_id': category_id,
+            'cost_center_id': cost_center_id,
+        }
+        for n, (acquisition_type, status) in enumerate(rows)
+    ])
+    db.session.commit()
+
+
+def test_dashboard_stats_counts(app):
+    seed_acquisitions([
+        (AcquisitionType.SERVICO, AcquisitionStatus.EM_ANALISE),
+        (AcquisitionType.INSUMO, AcquisitionStatus.EM_ANALISE),
+        (AcquisitionType.INSUMO, AcquisitionStatus.APROVADO),
+        (AcquisitionType.INSUMO, AcquisitionStatus.FECHADO),
+    ])
+
+    stats = get_dashboard_stats()
+
+    assert stats.total_acquisitions == 4
+    assert stats.servicos_count == 1
+    assert stats.insumos_count == 3
+    assert stats.pending_approvals == 2
+    assert stats.status_data == [
+        (AcquisitionStatus.EM_ANALISE, 2),
+        (AcquisitionStatus.APROVADO, 1),
+        (AcquisitionStatus.FECHADO, 1),
+    ]
+
+
+def test_dashboard_stats_is_one_query(app):
+    # Every status/type combination, so a per-status or per-type query would show up
+    seed_acquisitions([(acquisition_type, status)
+                       for acquisition_type in AcquisitionType for status in AcquisitionStatus])
+
+    with count_queries(db.engine) as statements:
+        get_dashboard_stats()
+
+    assert len(statements) == 1, statements
@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import db
+from models import Acquisition, AcquisitionStatus, AcquisitionType, Category, CostCenter, User
+from utils.data_export import csv_chunks, ndjson_chunks
+from utils.report_filters import apply_report_filters
+
+
+def seed_updates(*updated_at):
+    db.session.execute(insert(Acquisition), [
+        {
+            'title': f'Aquisição {n}',
+            'description': 'Teste',
+            'justification': 'Teste',
+            'type': AcquisitionType.INSUMO,
+            'status': AcquisitionStatus.EM_ANALISE,
+            'requester_id': User.query.first().id,
+            'category_id': Category.query.first().id,
+            'cost_center_id': CostCenter.query.first().id,
+            'updated_at': when,
+        }
+        for n, when in enumerate(updated_at)
+    ])
+    db.session.commit()
+
+
+def pull(updated_since):
+    """The NDJSON rows of an incremental export, as the export_data route orders them"""
+    query = apply_report_filters(Acquisition.query, {'updated_since': updated_since})
+    chunks = ndjson_chunks(query.order_by(Acquisition.updated_at, Acquisition.id))
+    return [json.loads(line) for line in ''.join(chunks).splitlines()]
+
+
+def test_last_updated_at_of_a_pull_is_the_next_updated_since(app):
+    seed_updates(datetime(2026, 1, 1, 8), datetime(2026, 1, 2, 9, 30), datetime(2026, 1, 3, 10))
+
+    rows = pull(datetime(2026, 1, 2))
+    assert [row['updated_at'] for row in rows] == ['2026-01-02T09:30:00', '2026-01-03T10:00:00']
+
+    # Only the row changed at the mark itself is sent again
+    assert pull(datetime.fromisoformat(rows[-1]['updated_at'])) == rows[-1:]
+
+
+def test_csv_export_has_the_updated_at_column(app):
+    seed_updates(datetime(2026, 1, 1, 8))
+
+    header, row = csv.reader(io.StringIO(''.join(csv_chunks(Acquisition.query))))
+    assert header[-1] == 'updated_at'
+    assert row[-1] == '2026-01-01T08:00:00'
@@ -0,0 +1,34 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+
+from app import db
+from models import Acquisition, AcquisitionStatus, AcquisitionType, Category, CostCenter, User
+from utils.excel_importer import insert_acquisitions
+
+
+def test_imported_rows_are_updated_at_import_time(app):
+    requested_at = datetime(2020, 5, 4, 10, 30)
+    df = pd.DataFrame([{
+        'title': 'Notebook importado',
+        'description': '',
+        'type': AcquisitionType.INSUMO,
+        'status': AcquisitionStatus.EM_ANALISE,
+        'justification': 'Importado',
+        'category_id': Category.query.first().id,
+        'cost_center_id': CostCenter.query.first().id,
+        'quantity': 1,
+        'unit': 'un',
+        'estimated_value': Decimal('100'),
+        'final_value': None,
+        'created_at': requested_at,
+    }])
+    before = datetime.now()
+
+    assert insert_acquisitions(df, User.query.first().id) == 1
+    db.session.commit()
+
+    acquisition = Acquisition.query.one()
+    assert acquisition.created_at == requested_at
+    assert acquisition.updated_at >= before
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from app import db
+from models import ImportRun, User
+from utils.import_runs import ImportRunner, STALE_AFTER
+
+
+def import_run(status, idle):
+    run = ImportRun(file_path='/tmp/import.xlsx', status=status, requested_by_id=User.query.first().id)
+    db.session.add(run)
+    db.session.commit()
+    run.updated_at = datetime.now() - idle
+    db.session.commit()
+    return run
+
+
+@pytest.mark.parametrize('status', ['pending', 'running'])
+def test_runs_whose_worker_died_can_be_resumed(app, status):
+    runner = ImportRunner()
+
+    assert not runner.can_resume(import_run(status, STALE_AFTER / 2))
+    assert runner.can_resume(import_run(status, STALE_AFTER * 2))
+
+
+def test_failed_runs_can_be_resumed_and_done_runs_cannot(app):
+    runner = ImportRunner()
+
+    assert runner.can_resume(import_run('failed', STALE_AFTER / 2))
+    assert not runner.can_resume(import_run('done', STALE_AFTER * 2))
@@ -0,0 +1,42 @@
+from email.mime.text import MIMEText
+
+from utils.email_service import MailQueue
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, message):
+        if message['Subject'] == 'quebrada':
+            raise UnicodeEncodeError('ascii', 'ç', 0, 1, 'ordinal not in range(128)')
+        self.sent.append(message['Subject'])
+
+    def quit(self):
+        pass
+
+
+def message(subject):
+    message = MIMEText('Teste')
+    message['To'] = 'usuario@example.com'
+    message['Subject'] = subject
+    return message
+
+
+def test_an_unexpected_error_drops_the_message_and_keeps_sending():
+    connections = []
+
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    mail = MailQueue(connect, retry_base=0.01)
+    for subject in ('primeira', 'quebrada', 'terceira'):
+        mail.put(message(subject))
+    assert mail.flush(timeout=5)
+
+    mail.put(message('depois'))
+    assert mail.flush(timeout=5)
+
+    assert [subject for connection in connections for subject in connection.sent] == ['primeira', 'terceira', 'depois']
+    assert (mail.sent, mail.failed) == (3, 1)
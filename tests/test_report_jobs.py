@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from app import db
+from models import ReportJob, User
+from utils.report_jobs import ReportJobQueue, STALE_AFTER
+
+
+class QueuedOnly:
+    """Executor that only records submissions, like a worker that died before running them"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+
+
+@pytest.fixture
+def queue():
+    queue = ReportJobQueue()
+    queue.executor = QueuedOnly()
+    return queue
+
+
+def lose_worker(job):
+    job.created_at = datetime.now() - STALE_AFTER * 2
+    db.session.commit()
+
+
+def test_identical_requests_share_an_in_flight_job(app, queue):
+    user_id = User.query.first().id
+    first = queue.submit('pdf', {'status': 'aprovado'}, user_id)
+
+    assert queue.submit('pdf', {'status': 'aprovado'}, user_id).id == first.id
+    assert len(queue.executor.submitted) == 1
+
+
+def test_a_lost_job_fails_and_a_resubmit_starts_a_new_one(app, queue):
+    user_id = User.query.first().id
+    lost = queue.submit('pdf', {'status': 'aprovado'}, user_id)
+    lose_worker(lost)
+
+    fresh = queue.submit('pdf', {'status': 'aprovado'}, user_id)
+
+    assert fresh.id != lost.id
+    assert db.session.get(ReportJob, lost.id).status == 'failed'
+
+
+def test_polling_a_lost_job_reports_it_failed(app, queue):
+    job = queue.submit('excel', {}, User.query.first().id)
+    lose_worker(job)
+
+    assert queue.fail_if_stale(job).status == 'failed'
+    assert job.error
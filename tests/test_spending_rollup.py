@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+
+from app import db
+from models import AcquisitionType, CostCenter, MonthlySpending
+from utils import spending_rollup
+from utils.spending_rollup import apply_rollup_delta
+
+
+@pytest.fixture(params=['upsert', 'fallback'])
+def rollup_path(request, monkeypatch):
+    """Run each test with ON CONFLICT and with the update/savepoint path used on other databases"""
+    if request.param == 'fallback':
+        monkeypatch.setattr(spending_rollup, '_dialect_insert', lambda: None)
+    return request.param
+
+
+def rollup_key():
+    return (2026, 3, AcquisitionType.INSUMO, CostCenter.query.first().id)
+
+
+def rollup_row(key):
+    year, month, acquisition_type, cost_center_id = key
+    return MonthlySpending.query.filter_by(year=year, month=month, type=acquisition_type,
+                                           cost_center_id=cost_center_id).one()
+
+
+def test_first_writes_to_a_key_add_up(app, rollup_path):
+    key = rollup_key()
+
+    apply_rollup_delta(key, 1, Decimal('100.50'), Decimal('90'))
+    apply_rollup_delta(key, 1, Decimal('20'), 0)
+    db.session.commit()
+
+    row = rollup_row(key)
+    assert (row.count, row.sum_final, row.sum_estimated) == (2, Decimal('120.50'), Decimal('90'))
+
+
+def test_row_created_by_another_transaction(app, rollup_path):
+    key = rollup_key()
+    year, month, acquisition_type, cost_center_id = key
+
+    # Another worker committed the row after this request started
+    with db.engine.begin() as connection:
+        connection.execute(insert(MonthlySpending), {
+            'year': year, 'month': month, 'type': acquisition_type, 'cost_center_id': cost_center_id,
+            'count': 3, 'sum_final': Decimal('30'), 'sum_estimated': Decimal('0'),
+        })
+
+    apply_rollup_delta(key, -1, Decimal('-10'), 0)
+    db.session.commit()
+
+    row = rollup_row(key)
+    assert (row.count, row.sum_final) == (2, Decimal('20'))
@@ -0,0 +1,141 @@
+"""
+Managed storage for generated reports and uploaded import files.
+
+Every temporary file the app produces is created through
+`artifact_store.new_path()` inside one directory (ARTIFACT_DIR). Files
+are deleted as soon as they are no longer needed (`release()`, e.g. after
+the response is sent) and, as a safety net, evicted when older than
+ARTIFACT_MAX_AGE_HOURS or when the directory grows past ARTIFACT_MAX_MB
+(oldest first).
+
+Files that must survive the size pass are pinned with an empty
+"<file>.pin" marker next to them: files still being written (from
+new_path() until mark_complete()) and files something still references,
+such as an uploaded import waiting for confirmation or resume, or the
+output of a finished report job (`pin()`). The markers live on disk, so
+every gunicorn worker sees them; pinned files are only removed by
+release() or by age. Files finished in the last SIZE_EVICTION_GRACE
+seconds are also skipped, so a caller can pin a file it just completed.
+"""
+
+import os
+import time
+import uuid
+import logging
+import tempfile
+
+PIN_SUFFIX = '.pin'
+
+# Seconds after its last write during which a file is not evicted for size
+SIZE_EVICTION_GRACE = 60
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logging.warning(f"Could not remove artifact {path}: {e}")
+        return False
+
+
+class ArtifactStore:
+    def __init__(self, directory, max_bytes, max_age_seconds):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def new_path(self, suffix, prefix='artifact_'):
+        """Reserve a new file path; it stays pinned until mark_complete() or release()"""
+        self.evict()
+        path = os.path.join(self.directory, f"{prefix}{uuid.uuid4().hex}{suffix}")
+        open(path, 'wb').close()
+        self.pin(path)
+        return path
+
+    def pin(self, path):
+        """Keep a file out of size eviction (in every process) until release() or expiry"""
+        if path and self.owns(path):
+            open(path + PIN_SUFFIX, 'wb').close()
+
+    def mark_complete(self, path):
+        """The file is fully written and not referenced; it may now be evicted by age or size"""
+        if path and self.owns(path):
+            _unlink(path + PIN_SUFFIX)
+
+    def release(self, path):
+        """Delete a file that is no longer needed"""
+        if not path or not self.owns(path):
+            return
+        _unlink(path)
+        _unlink(path + PIN_SUFFIX)
+
+    def owns(self, path):
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.directory)
+
+    def _files(self):
+        """(mtime, size, path) of the stored files, and the set of pinned paths"""
+        files = []
+        pinned = set()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(PIN_SUFFIX):
+                pinned.add(entry.path[:-len(PIN_SUFFIX)])
+                continue
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                continue
+        return files, pinned
+
+    def evict(self):
+        """Remove expired files, then the oldest unpinned ones while over the size budget"""
+        now = time.time()
+        files, pinned = self._files()
+        files.sort()
+
+        total = sum(size for mtime, size, path in files)
+        for mtime, size, path in files:
+            expired = now - mtime > self.max_age_seconds
+            if not expired:
+                if path in pinned or total <= self.max_bytes or now - mtime < SIZE_EVICTION_GRACE:
+                    continue
+            if not _unlink(path):
+                continue
+            if path in pinned:
+                _unlink(path + PIN_SUFFIX)
+            total -= size
+            self.evicted_files += 1
+            self.evicted_bytes += size
+
+        # Markers whose file is gone (removed outside the store)
+        existing = {path for mtime, size, path in files}
+        for path in pinned - existing:
+            if not os.path.exists(path):
+                _unlink(path + PIN_SUFFIX)
+
+    def stats(self):
+        files, pinned = self._files()
+        return {
+            'directory': self.directory,
+            'files': len(files),
+            'bytes_in_use': sum(size for mtime, size, path in files),
+            'max_bytes': self.max_bytes,
+            'pinned_files': len(pinned),
+            'evicted_files': self.evicted_files,
+            'evicted_bytes': self.evicted_bytes,
+        }
+
+
+# Global instance
+artifact_store = ArtifactStore(
+    directory=os.environ.get('ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'acompanhamento_artifacts')),
+    max_bytes=int(float(os.environ.get('ARTIFACT_MAX_MB', '1024')) * 1024 * 1024),
+    max_age_seconds=float(os.environ.get('ARTIFACT_MAX_AGE_HOURS', '24')) * 3600
+)
@@ -0,0 +1,180 @@
+"""
+Cache for the aggregate data behind the dashboard and reports pages.
+
+Entries are keyed by name, role, filters and a data version counter.
+Every write path that changes acquisition data calls
+`response_cache.bump_version()`, which makes all older entries
+unreachable (they then age out through TTL/LRU eviction).
+
+The default backend is an in-process LRU with TTL. Set CACHE_URL to a
+redis:// URL (Redis or any Redis-compatible server) to share entries and
+the version counter across gunicorn workers; with the in-process backend
+each worker only sees its own version bumps, so TTL bounds staleness.
+"""
+
+import os
+import pickle
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """Interface every cache backend implements"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def incr(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """Thread-safe in-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires_at = self._entries.get(key, (0, None))
+            self._entries[key] = (value + 1, expires_at)
+            return value + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(CacheBackend):
+    """Backend for Redis or any server speaking the Redis protocol"""
+
+    def __init__(self, url, prefix='acompanhamento:'):
+        import redis  # optional dependency, only needed when CACHE_URL is set
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """Versioned get-or-compute cache with hit/miss counters"""
+
+    VERSION_KEY = 'data_version'
+
+    def __init__(self, backend, default_ttl=300):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def data_version(self):
+        return int(self.backend.get(self.VERSION_KEY) or 0)
+
+    def bump_version(self):
+        """Invalidate every cached entry after a data change"""
+        try:
+            self.backend.incr(self.VERSION_KEY)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Failed to bump cache version: {e}")
+
+    def make_key(self, name, role=None, filters=None):
+        filter_part = '&'.join(f"{k}={v}" for k, v in sorted((filters or {}).items()) if v not in (None, ''))
+        return f"{name}:v{self.data_version()}:{role or '-'}:{filter_part}"
+
+    def get_or_compute(self, name, compute, role=None, filters=None, ttl=None):
+        """Return the cached value for this key or compute and store it"""
+        try:
+            key = self.make_key(name, role, filters)
+            value = self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never break the page
+            self.errors += 1
+            logging.error(f"Cache read failed for {name}: {e}")
+            return compute()
+
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        try:
+            self.backend.set(key, value, ttl if ttl is not None else self.default_ttl)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Cache write failed for {name}: {e}")
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'data_version': self.data_version(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def create_cache_from_env():
+    ttl = int(os.environ.get('CACHE_TTL', '300'))
+    url = os.environ.get('CACHE_URL')
+
+    if url:
+        try:
+            return ResponseCache(RedisCache(url), default_ttl=ttl)
+        except Exception as e:
+            logging.warning(f"Cache backend at CACHE_URL unavailable, using in-process cache: {e}")
+
+    max_entries = int(os.environ.get('CACHE_MAX_ENTRIES', '256'))
+    return ResponseCache(MemoryCache(max_entries=max_entries), default_ttl=ttl)
+
+
+# Global instance
+response_cache = create_cache_from_env()
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+from sqlalchemy import func
+from app import db
+from models import Acquisition, AcquisitionType, AcquisitionStatus
+
+
+@dataclass
+class DashboardStats:
+    """Counters shown on the dashboard cards and status chart"""
+    total_acquisitions: int = 0
+    servicos_count: int = 0
+    insumos_count: int = 0
+    pending_approvals: int = 0
+    status_data: list = field(default_factory=list)  # [(AcquisitionStatus, count)]
+
+
+def get_dashboard_stats():
+    """Compute all dashboard counters from a single grouped query"""
+    rows = db.session.query(
+        Acquisition.status,
+        Acquisition.type,
+        func.count(Acquisition.id)
+    ).group_by(Acquisition.status, Acquisition.type).all()
+
+    stats = DashboardStats()
+    status_counts = {}
+
+    for status, acquisition_type, count in rows:
+        stats.total_acquisitions += count
+
+        if acquisition_type == AcquisitionType.SERVICO:
+            stats.servicos_count += count
+        elif acquisition_type == AcquisitionType.INSUMO:
+            stats.insumos_count += count
+
+        if status == AcquisitionStatus.EM_ANALISE:
+            stats.pending_approvals += count
+
+        if status is not None:
+            status_counts[status] = status_counts.get(status, 0) + count
+
+    # Keep the workflow order of the enum for the chart
+    stats.status_data = [(status, status_counts[status]) for status in AcquisitionStatus if status in status_counts]
+
+    return stats
@@ -0,0 +1,82 @@
+"""
+Row-by-row CSV and NDJSON export of the "Dados Detalhados" columns.
+
+Rows are fetched in batches as ReportRow tuples (utils/report_data.py),
+without building ORM objects, and encoded into ~64 KB chunks, so the
+response can be sent with chunked transfer encoding while the query is
+still being read. Optionally the stream is gzip-compressed on the fly.
+
+Besides the report columns, every row carries its ISO updated_at: the
+largest value received is the high-water mark an incremental consumer
+passes back as updated_since (rows changed at that same instant are sent
+again, so consumers should upsert by ID).
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from utils.excel_generator import DETAIL_COLUMNS, detail_row
+from utils.report_data import report_rows
+
+COLUMN_NAMES = [name for name, width in DETAIL_COLUMNS] + ['updated_at']
+
+CHUNK_SIZE = 64 * 1024
+
+
+def export_row(row):
+    """Values of one ReportRow in COLUMN_NAMES order"""
+    return detail_row(row) + [row.updated_at.isoformat() if row.updated_at else '']
+
+
+def csv_chunks(acquisitions, batch_size=1000):
+    """Yield the CSV export as text chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMN_NAMES)
+
+    for row in report_rows(acquisitions, batch_size=batch_size):
+        writer.writerow(export_row(row))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(acquisitions, batch_size=1000):
+    """Yield the NDJSON export (one object per line) as text chunks"""
+    lines = []
+    size = 0
+
+    for row in report_rows(acquisitions, batch_size=batch_size):
+        line = json.dumps(
+            dict(zip(COLUMN_NAMES, export_row(row))),
+            ensure_ascii=False
+        )
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+            size = 0
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def encode_chunks(chunks, compress=False):
+    """UTF-8 encode text chunks, gzip-compressing the stream if requested"""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode('utf-8')
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,150 +1,320 @@
+"""
+Email notifications.
+
+Messages are rendered from compiled templates in templates/email (HTML plus
+a plain-text alternative) and are not sent in the caller: _send_email()
+puts them on a MailQueue whose background thread delivers them over one
+reused SMTP connection.
+
+Configuration: SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD,
+SMTP_STARTTLS (default 1), SMTP_AUTH (default 1), SMTP_BATCH_SIZE,
+SMTP_MAX_ATTEMPTS, SMTP_RETRY_BASE_SECONDS and SMTP_IDLE_SECONDS. To try it
+against a local stand-in:
+
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_SERVER=localhost SMTP_PORT=8025 SMTP_STARTTLS=0 SMTP_AUTH=0 EMAIL_USER=sistema@localhost
+"""
+
 import os
+import time
+import heapq
+import queue
 import smtplib
+import threading
+import itertools
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from flask import render_template_string
+from jinja2 import Environment, FileSystemLoader
 import logging
 
+class MailQueue:
+    """Outbound mail queue drained by one background sender thread.
+    
+    The sender keeps a single authenticated SMTP connection open while there
+    is mail to send (closing it after `idle_timeout` seconds without any),
+    sends up to `batch_size` queued messages per pass over that connection
+    and retries transient failures with exponential backoff
+    (retry_base * 2^attempt seconds) up to `max_attempts` times.
+    """
+    
+    def __init__(self, connect, batch_size=50, max_attempts=5, retry_base=2.0, idle_timeout=60.0):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.idle_timeout = idle_timeout
+        
+        self._queue = queue.Queue()
+        self._retries = []  # heap of (due time, sequence, message, attempt)
+        self._sequence = itertools.count()
+        self._connection = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections_opened = 0
+    
+    def put(self, message):
+        with self._lock:
+            self._pending += 1
+        self._queue.put((message, 0))
+        self._ensure_sender()
+    
+    def flush(self, timeout=None):
+        """Wait until every queued message was sent or given up; returns False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+    
+    def stats(self):
+        return {
+            'pending': self._pending,
+            'queued': self._queue.qsize(),
+            'waiting_retry': len(self._retries),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'connections_opened': self.connections_opened,
+            'connected': self._connection is not None,
+        }
+    
+    def _ensure_sender(self):
+        # Also restarts the sender in a forked worker process, where the thread doesn't exist
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-sender', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            timeout = self.idle_timeout
+            if self._retries:
+                timeout = max(0.0, min(timeout, self._retries[0][0] - time.monotonic()))
+            
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                if not self._retries:
+                    self._disconnect()
+            
+            while len(batch) < self.batch_size and self._retries and self._retries[0][0] <= time.monotonic():
+                due, sequence, message, attempt = heapq.heappop(self._retries)
+                batch.append((message, attempt))
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            for message, attempt in batch:
+                self._deliver(message, attempt)
+    
+    def _deliver(self, message, attempt):
+        try:
+            if self._connection is None:
+                self._connection = self.connect()
+                self.connections_opened += 1
+            self._connection.send_message(message)
+            self.sent += 1
+            logging.info(f"Email sent successfully to {message['To']}")
+            self._done()
+        except smtplib.SMTPRecipientsRefused as e:
+            self._give_up(message, e)
+        except smtplib.SMTPResponseException as e:
+            # 5xx replies are permanent; anything else may work on a new connection
+            if e.smtp_code >= 500:
+                self._give_up(message, e)
+            else:
+                self._retry(message, attempt, e)
+        except (smtplib.SMTPException, OSError) as e:
+            self._retry(message, attempt, e)
+        except Exception as e:
+            # A broken message (e.g. encoding) won't send on retry; drop it, keep the sender alive
+            # and start the next one on a fresh connection, as this one may be mid-transaction
+            self._disconnect()
+            self._give_up(message, e)
+    
+    def _retry(self, message, attempt, error):
+        self._disconnect()
+        if attempt + 1 >= self.max_attempts:
+            self._give_up(message, error)
+            return
+        delay = self.retry_base * 2 ** attempt
+        logging.warning(f"Failed to send email to {message['To']} ({error}), retrying in {delay:g}s")
+        heapq.heappush(self._retries, (time.monotonic() + delay, next(self._sequence), message, attempt + 1))
+        self.retried += 1
+    
+    def _give_up(self, message, error):
+        logging.error(f"Failed to send email to {message['To']}: {error}")
+        self.failed += 1
+        self._done()
+    
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+    
+    def _disconnect(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._connection = None
+
+
+class EmailTemplates:
+    """Email templates from templates/email, compiled once and cached.
+    
+    Every message has an HTML template (<name>.html) and a plain-text
+    alternative (<name>.txt). The environment doesn't depend on a Flask
+    app or request context, so it also works on background threads.
+    """
+    
+    def __init__(self, directory):
+        self.html = Environment(loader=FileSystemLoader(directory), autoescape=True,
+                                auto_reload=False, cache_size=-1)
+        self.text = Environment(loader=FileSystemLoader(directory), autoescape=False,
+                                auto_reload=False, cache_size=-1, trim_blocks=True, lstrip_blocks=True)
+    
+    def render(self, name, **context):
+        """(html, text) for one message"""
+        return self.render_batch(name, [context])[0]
+    
+    def render_batch(self, name, contexts):
+        """(html, text) for every context, looking the templates up only once"""
+        html_template = self.html.get_template(f'{name}.html')
+        text_template = self.text.get_template(f'{name}.txt')
+        return [(html_template.render(context), text_template.render(context)) for context in contexts]
+
+
 class EmailService:
     def __init__(self):
         self.smtp_server = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
         self.smtp_port = int(os.environ.get('SMTP_PORT', '587'))
+        self.smtp_starttls = os.environ.get('SMTP_STARTTLS', '1') != '0'
+        # SMTP_AUTH=0 sends without login, e.g. to a local relay or an aiosmtpd stand-in
+        self.smtp_auth = os.environ.get('SMTP_AUTH', '1') != '0'
         self.email = os.environ.get('EMAIL_USER')
         self.password = os.environ.get('EMAIL_PASSWORD')
-        self.enabled = bool(self.email and self.password)
+        self.enabled = bool(self.email and (self.password or not self.smtp_auth))
+        
+        self.queue = MailQueue(
+            self._connect,
+            batch_size=int(os.environ.get('SMTP_BATCH_SIZE', '50')),
+            max_attempts=int(os.environ.get('SMTP_MAX_ATTEMPTS', '5')),
+            retry_base=float(os.environ.get('SMTP_RETRY_BASE_SECONDS', '2')),
+            idle_timeout=float(os.environ.get('SMTP_IDLE_SECONDS', '60'))
+        )
         
         if not self.enabled:
             logging.warning("Email service disabled - EMAIL_USER and EMAIL_PASSWORD not configured")
     
     def send_status_notification(self, acquisition, new_status, user_email, user_name):
         """Send notification when acquisition status changes"""
+        return self.send_status_notifications(acquisition, new_status, [(user_email, user_name)]) == 1
+    
+    def send_status_notifications(self, acquisition, new_status, recipients):
+        """Notify every (email, name) recipient of a status change; returns how many were queued"""
         if not self.enabled:
-            return False
+            return 0
             
         try:
             subject = f"[SENAI] Atualização na solicitação #{acquisition.id}"
-            
-            # Email template
-            template = """
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="background: #1e4a6b; color: white; padding: 20px; text-align: center;">
-                        <h1>SENAI Morvan Figueiredo</h1>
-                        <h2>Sistema de Acompanhamento de Aquisições</h2>
-                    </div>
-                    
-                    <div style="padding: 20px; background: #f9f9f9; border-left: 4px solid #1e4a6b;">
-                        <h3>Olá, {{ user_name }}!</h3>
-                        <p>A solicitação <strong>#{{ acquisition.id }}</strong> teve seu status atualizado.</p>
-                        
-                        <div style="margin: 20px 0; padding: 15px; background: white; border-radius: 5px;">
-                            <h4>Detalhes da Solicitação:</h4>
-                            <p><strong>Título:</strong> {{ acquisition.title }}</p>
-                            <p><strong>Tipo:</strong> {{ acquisition.type_display }}</p>
-                            <p><strong>Status Atual:</strong> <span style="color: #1e4a6b; font-weight: bold;">{{ acquisition.status_display }}</span></p>
-                            <p><strong>Solicitante:</strong> {{ acquisition.requester.full_name }}</p>
-                            <p><strong>Data da Solicitação:</strong> {{ acquisition.created_at.strftime('%d/%m/%Y %H:%M') }}</p>
-                        </div>
-                        
-                        <p>Para mais detalhes, acesse o sistema de acompanhamento.</p>
-                    </div>
-                    
-                    <div style="text-align: center; padding: 20px; color: #666; font-size: 12px;">
-                        <p>Este é um e-mail automático do Sistema de Acompanhamento de Aquisições - SENAI Morvan Figueiredo</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            html_content = render_template_string(template, 
-                                                acquisition=acquisition, 
-                                                user_name=user_name, 
-                                                new_status=new_status)
-            
-            return self._send_email(user_email, subject, html_content)
+            messages = email_templates.render_batch('status_notification', [
+                {'acquisition': acquisition, 'user_name': name, 'new_status': new_status}
+                for email, name in recipients
+            ])
+            return sum(
+                self._send_email(email, subject, html_content, text_content)
+                for (email, name), (html_content, text_content) in zip(recipients, messages)
+            )
             
         except Exception as e:
             logging.error(f"Error sending status notification: {e}")
-            return False
+            return 0
     
     def send_approval_request(self, acquisition, approver_email, approver_name):
         """Send notification to approver when acquisition needs approval"""
+        return self.send_approval_requests(acquisition, [(approver_email, approver_name)]) == 1
+    
+    def send_approval_requests(self, acquisition, approvers):
+        """Ask every (email, name) approver to review an acquisition; returns how many were queued"""
         if not self.enabled:
-            return False
+            return 0
             
         try:
             subject = f"[SENAI] Solicitação aguardando aprovação #{acquisition.id}"
+            messages = email_templates.render_batch('approval_request', [
+                {'acquisition': acquisition, 'approver_name': name}
+                for email, name in approvers
+            ])
+            return sum(
+                self._send_email(email, subject, html_content, text_content)
+                for (email, name), (html_content, text_content) in zip(approvers, messages)
+            )
             
-            template = """
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <div style="background: #d32f2f; color: white; padding: 20px; text-align: center;">
-                        <h1>SENAI Morvan Figueiredo</h1>
-                        <h2>Solicitação Aguardando Aprovação</h2>
-                    </div>
-                    
-                    <div style="padding: 20px; background: #fff3e0; border-left: 4px solid #d32f2f;">
-                        <h3>Olá, {{ approver_name }}!</h3>
-                        <p>Uma nova solicitação está aguardando sua aprovação.</p>
-                        
-                        <div style="margin: 20px 0; padding: 15px; background: white; border-radius: 5px;">
-                            <h4>Detalhes da Solicitação:</h4>
-                            <p><strong>Título:</strong> {{ acquisition.title }}</p>
-                            <p><strong>Tipo:</strong> {{ acquisition.type_display }}</p>
-                            <p><strong>Valor Estimado:</strong> R$ {{ "%.2f"|format(acquisition.estimated_value) if acquisition.estimated_value else "Não informado" }}</p>
-                            <p><strong>Solicitante:</strong> {{ acquisition.requester.full_name }}</p>
-                            <p><strong>Justificativa:</strong> {{ acquisition.justification[:200] }}{{ "..." if acquisition.justification|length > 200 else "" }}</p>
-                        </div>
-                        
-                        <p style="color: #d32f2f; font-weight: bold;">Acesse o sistema para revisar e aprovar a solicitação.</p>
-                    </div>
-                    
-                    <div style="text-align: center; padding: 20px; color: #666; font-size: 12px;">
-                        <p>Este é um e-mail automático do Sistema de Acompanhamento de Aquisições - SENAI Morvan Figueiredo</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            html_content = render_template_string(template, 
-                                                acquisition=acquisition, 
-                                                approver_name=approver_name)
+        except Exception as e:
+            logging.error(f"Error sending approval request: {e}")
+            return 0
+    
+    def send_digest(self, user_email, user_name, digest, date):
+        """Send a user's daily digest (see utils/notifications.py)"""
+        if not self.enabled:
+            return False
             
-            return self._send_email(approver_email, subject, html_content)
+        try:
+            subject = f"[SENAI] Resumo diário de aquisições - {date.strftime('%d/%m/%Y')}"
+            html_content, text_content = email_templates.render('digest', user_name=user_name, date=date, **digest)
+            return self._send_email(user_email, subject, html_content, text_content)
             
         except Exception as e:
-            logging.error(f"Error sending approval request: {e}")
+            logging.error(f"Error sending digest: {e}")
             return False
     
-    def _send_email(self, to_email, subject, html_content):
-        """Send email with HTML content"""
+    def _connect(self):
+        """Open an SMTP connection, upgraded to TLS and logged in as configured"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        try:
+            if self.smtp_starttls:
+                server.starttls()
+            if self.smtp_auth:
+                server.login(self.email or '', self.password or '')
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _send_email(self, to_email, subject, html_content, text_content=None):
+        """Queue an email with HTML content (and a plain-text alternative); it is sent by the background sender"""
         try:
             msg = MIMEMultipart('alternative')
             msg['From'] = self.email
             msg['To'] = to_email
             msg['Subject'] = subject
             
+            # Clients show the last alternative they support, so plain text goes first
+            if text_content:
+                msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
             html_part = MIMEText(html_content, 'html', 'utf-8')
             msg.attach(html_part)
             
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email or '', self.password or '')
-            server.send_message(msg)
-            server.quit()
-            
-            logging.info(f"Email sent successfully to {to_email}")
+            self.queue.put(msg)
             return True
             
         except Exception as e:
-            logging.error(f"Failed to send email to {to_email}: {e}")
+            logging.error(f"Failed to queue email to {to_email}: {e}")
             return False
 
-# Global instance
+# Global instances
+email_templates = EmailTemplates(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                              'templates', 'email'))
 email_service = EmailService()
@@ -1,19 +1,64 @@
-import os
-import tempfile
 from datetime import datetime
 import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.chart import PieChart, BarChart, Reference
+from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
 from models import AcquisitionType
+from utils.artifact_store import artifact_store
+from utils.report_data import report_summary, report_rows
 
-def generate_excel_report(acquisitions):
-    """Generate a professional Excel report with acquisition data"""
+# Columns of the "Dados Detalhados" sheet with their fixed widths
+DETAIL_COLUMNS = [
+    ('ID', 8),
+    ('Título', 40),
+    ('Tipo', 10),
+    ('Categoria', 28),
+    ('Status', 22),
+    ('Solicitante', 25),
+    ('Centro de Custo', 20),
+    ('Valor Estimado', 15),
+    ('Valor Final', 15),
+    ('Data Solicitação', 16),
+    ('Data Aprovação', 16),
+    ('Data Conclusão', 16),
+    ('Justificativa', 50),
+    ('Fonte da Verba', 18),
+    ('Método de Pagamento', 20),
+]
+
+def detail_row(row):
+    """Values of one ReportRow in DETAIL_COLUMNS order"""
+    return [
+        row.id,
+        row.title,
+        row.type_label,
+        row.category,
+        row.status_label,
+        row.requester,
+        row.cost_center,
+        row.estimated_value,
+        row.final_value,
+        row.created_at.strftime('%d/%m/%Y') if row.created_at else '',
+        row.approved_at.strftime('%d/%m/%Y') if row.approved_at else '',
+        row.completed_at.strftime('%d/%m/%Y') if row.completed_at else '',
+        row.justification[:100] + ('...' if len(row.justification) > 100 else ''),
+        row.budget_source,
+        row.payment_method,
+    ]
+
+def generate_excel_report(query, filters_description=''):
+    """Generate a professional Excel report with acquisition data.
+
+    `query` is an Acquisition query, already filtered (filters_description is
+    written under the title); the summary and chart tables come from
+    report_summary() and the detail sheet from report_rows().
+    """
     
-    # Create temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-    temp_file.close()
+    # Reserve the output file in the managed artifact store
+    file_path = artifact_store.new_path('.xlsx', prefix='relatorio_')
     
     # Create workbook
     wb = Workbook()
@@ -49,14 +94,17 @@ def generate_excel_report(acquisitions):
     summary_sheet['A2'].font = normal_font
     summary_sheet.merge_cells('A2:F2')
     
-    # Statistics
-    total_acquisitions = len(acquisitions)
-    servicos_count = len([a for a in acquisitions if a.type == AcquisitionType.SERVICO])
-    insumos_count = len([a for a in acquisitions if a.type == AcquisitionType.INSUMO])
+    if filters_description:
+        summary_sheet['A3'] = f'Filtros: {filters_description}'
+        summary_sheet['A3'].font = normal_font
+        summary_sheet.merge_cells('A3:F3')
     
-    total_value = sum([a.final_value or 0 for a in acquisitions])
-    servicos_value = sum([a.final_value or 0 for a in acquisitions if a.type == AcquisitionType.SERVICO])
-    insumos_value = sum([a.final_value or 0 for a in acquisitions if a.type == AcquisitionType.INSUMO])
+    # Statistics
+    summary = report_summary(query)
+    servicos_count, servicos_value = summary.by_type[AcquisitionType.SERVICO]
+    insumos_count, insumos_value = summary.by_type[AcquisitionType.INSUMO]
+    total_acquisitions = summary.count
+    total_value = summary.value
     
     # Summary table
     summary_data = [
@@ -77,10 +125,25 @@ def generate_excel_report(acquisitions):
             if col_num == 3 and row_num > 4 and isinstance(value, (int, float)):
                 cell.number_format = 'R$ #,##0.00'
     
+    # Cost center table
+    cost_center_data = [['Centro de Custo', 'Quantidade', 'Valor (R$)']] + \
+        [list(row) for row in summary.by_cost_center]
+    
+    for row_num, row_data in enumerate(cost_center_data, 10):
+        for col_num, value in enumerate(row_data, 1):
+            cell = summary_sheet.cell(row=row_num, column=col_num, value=value)
+            cell.font = header_font if row_num == 10 else normal_font
+            cell.fill = header_fill if row_num == 10 else PatternFill()
+            cell.border = border
+            cell.alignment = center_alignment
+            
+            if col_num == 3 and row_num > 10:
+                cell.number_format = 'R$ #,##0.00'
+    
     # Auto-width columns
     for column in summary_sheet.columns:
         max_length = 0
-        column_letter = column[0].column_letter
+        column_letter = get_column_letter(column[0].column)
         for cell in column:
             try:
                 if len(str(cell.value)) > max_length:
@@ -94,27 +157,8 @@ def generate_excel_report(acquisitions):
     details_sheet = wb.create_sheet("Dados Detalhados")
     
     # Create DataFrame
-    data = []
-    for acquisition in acquisitions:
-        data.append({
-            'ID': acquisition.id,
-            'Título': acquisition.title,
-            'Tipo': acquisition.type_display,
-            'Categoria': acquisition.category.name if acquisition.category else '',
-            'Status': acquisition.status_display,
-            'Solicitante': acquisition.requester.full_name,
-            'Centro de Custo': acquisition.cost_center.name if acquisition.cost_center else '',
-            'Valor Estimado': acquisition.estimated_value or 0,
-            'Valor Final': acquisition.final_value or 0,
-            'Data Solicitação': acquisition.created_at.strftime('%d/%m/%Y'),
-            'Data Aprovação': acquisition.approved_at.strftime('%d/%m/%Y') if acquisition.approved_at else '',
-            'Data Conclusão': acquisition.completed_at.strftime('%d/%m/%Y') if acquisition.completed_at else '',
-            'Justificativa': acquisition.justification[:100] + ('...' if len(acquisition.justification) > 100 else ''),
-            'Fonte da Verba': acquisition.budget_source.value if acquisition.budget_source else '',
-            'Método de Pagamento': acquisition.payment_method.value if acquisition.payment_method else ''
-        })
-    
-    df = pd.DataFrame(data)
+    df = pd.DataFrame([detail_row(row) for row in report_rows(query)],
+                      columns=[name for name, width in DETAIL_COLUMNS])
     
     # Add DataFrame to sheet
     for r in dataframe_to_rows(df, index=False, header=True):
@@ -143,7 +187,7 @@ def generate_excel_report(acquisitions):
     # Auto-width columns
     for column in details_sheet.columns:
         max_length = 0
-        column_letter = column[0].column_letter
+        column_letter = get_column_letter(column[0].column)
         for cell in column:
             try:
                 if len(str(cell.value)) > max_length:
@@ -192,13 +236,8 @@ def generate_excel_report(acquisitions):
     charts_sheet['A10'] = 'Distribuição por Status'
     charts_sheet['A10'].font = Font(name='Calibri', size=12, bold=True)
     
-    status_counts = {}
-    for acquisition in acquisitions:
-        status = acquisition.status_display
-        status_counts[status] = status_counts.get(status, 0) + 1
-    
     status_data = [['Status', 'Quantidade']]
-    for status, count in status_counts.items():
+    for status, count in summary.by_status:
         status_data.append([status, count])
     
     for row_num, row_data in enumerate(status_data, 11):
@@ -217,13 +256,158 @@ def generate_excel_report(acquisitions):
     bar_chart.y_axis.title = 'Quantidade'
     bar_chart.x_axis.title = 'Status'
     
-    data = Reference(charts_sheet, min_col=2, min_row=11, max_row=11+len(status_counts))
-    cats = Reference(charts_sheet, min_col=1, min_row=12, max_row=11+len(status_counts))
+    data = Reference(charts_sheet, min_col=2, min_row=11, max_row=11+len(summary.by_status))
+    cats = Reference(charts_sheet, min_col=1, min_row=12, max_row=11+len(summary.by_status))
     bar_chart.add_data(data, titles_from_data=True)
     bar_chart.set_categories(cats)
     charts_sheet.add_chart(bar_chart, "D12")
     
     # Save file
-    wb.save(temp_file.name)
-    
-    return temp_file.name
+    try:
+        wb.save(file_path)
+    except Exception:
+        artifact_store.release(file_path)
+        raise
+    
+    artifact_store.mark_complete(file_path)
+    return file_path
+
+def _named_styles():
+    """Named styles shared by every cell of the streaming report"""
+    side = Side(style='thin')
+    border = Border(left=side, right=side, top=side, bottom=side)
+
+    header = NamedStyle(name='report_header')
+    header.font = Font(name='Calibri', size=14, bold=True, color='FFFFFF')
+    header.fill = PatternFill(start_color='1e4a6b', end_color='1e4a6b', fill_type='solid')
+    header.border = border
+    header.alignment = Alignment(horizontal='center', vertical='center')
+
+    title = NamedStyle(name='report_title')
+    title.font = Font(name='Calibri', size=16, bold=True, color='1e4a6b')
+
+    cell = NamedStyle(name='report_cell')
+    cell.font = Font(name='Calibri', size=11)
+    cell.border = border
+    cell.alignment = Alignment(horizontal='left', vertical='center')
+
+    currency = NamedStyle(name='report_currency')
+    currency.font = Font(name='Calibri', size=11)
+    currency.border = border
+    currency.alignment = Alignment(horizontal='left', vertical='center')
+    currency.number_format = 'R$ #,##0.00'
+
+    return [header, title, cell, currency]
+
+def _styled_row(sheet, values, style, currency_columns=()):
+    row = []
+    for index, value in enumerate(values):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.style = 'report_currency' if index in currency_columns and value else style
+        row.append(cell)
+    return row
+
+def write_excel_report_streaming(acquisitions, file_path, batch_size=1000, filters_description=''):
+    """Write the Excel report with write-only worksheets.
+
+    `acquisitions` is a query; rows are fetched in batches by report_rows() and
+    written straight to disk, so memory stays flat regardless of row count.
+    The summary comes from report_summary().
+    """
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+
+    # Sheets are created in display order; rows can be appended to each in any order
+    summary_sheet = wb.create_sheet("Resumo Executivo")
+    details_sheet = wb.create_sheet("Dados Detalhados")
+    charts_sheet = wb.create_sheet("Gráficos e Análises")
+
+    for index, (name, width) in enumerate(DETAIL_COLUMNS, 1):
+        details_sheet.column_dimensions[get_column_letter(index)].width = width
+    details_sheet.freeze_panes = 'A2'
+    details_sheet.append(_styled_row(details_sheet, [name for name, width in DETAIL_COLUMNS], 'report_header'))
+
+    summary = report_summary(acquisitions)
+    counts = {acquisition_type: count for acquisition_type, (count, value) in summary.by_type.items()}
+    values = {acquisition_type: value for acquisition_type, (count, value) in summary.by_type.items()}
+    currency_columns = (7, 8)
+
+    for row in report_rows(acquisitions, batch_size=batch_size):
+        details_sheet.append(_styled_row(details_sheet, detail_row(row), 'report_cell', currency_columns))
+
+    # Summary sheet
+    summary_sheet.column_dimensions['A'].width = 30
+    summary_sheet.column_dimensions['B'].width = 15
+    summary_sheet.column_dimensions['C'].width = 20
+    summary_sheet.append(_styled_row(summary_sheet, ['SENAI Morvan Figueiredo - Relatório de Aquisições'], 'report_title'))
+    summary_sheet.append([f'Gerado em: {datetime.now().strftime("%d/%m/%Y %H:%M")}'])
+    summary_sheet.append([f'Filtros: {filters_description}'] if filters_description else [])
+    summary_sheet.append(_styled_row(summary_sheet, ['Indicador', 'Quantidade', 'Valor (R$)'], 'report_header'))
+    summary_rows = [
+        ['Total de Solicitações', summary.count, summary.value],
+        ['Serviços', counts[AcquisitionType.SERVICO], values[AcquisitionType.SERVICO]],
+        ['Insumos', counts[AcquisitionType.INSUMO], values[AcquisitionType.INSUMO]],
+    ]
+    for row in summary_rows:
+        summary_sheet.append(_styled_row(summary_sheet, row, 'report_cell', currency_columns=(2,)))
+    summary_sheet.append([])
+    summary_sheet.append(_styled_row(summary_sheet, ['Centro de Custo', 'Quantidade', 'Valor (R$)'], 'report_header'))
+    for row in summary.by_cost_center:
+        summary_sheet.append(_styled_row(summary_sheet, row, 'report_cell', currency_columns=(2,)))
+
+    # Charts sheet: type table at rows 3-5, status table from row 8
+    charts_sheet.column_dimensions['A'].width = 25
+    charts_sheet.column_dimensions['B'].width = 15
+    charts_sheet.append(_styled_row(charts_sheet, ['Análise Visual dos Dados'], 'report_title'))
+    charts_sheet.append([])
+    charts_sheet.append(_styled_row(charts_sheet, ['Tipo', 'Quantidade'], 'report_header'))
+    charts_sheet.append(_styled_row(charts_sheet, ['Serviços', counts[AcquisitionType.SERVICO]], 'report_cell'))
+    charts_sheet.append(_styled_row(charts_sheet, ['Insumos', counts[AcquisitionType.INSUMO]], 'report_cell'))
+    charts_sheet.append([])
+    charts_sheet.append([])
+    charts_sheet.append(_styled_row(charts_sheet, ['Status', 'Quantidade'], 'report_header'))
+    for status, count in summary.by_status:
+        charts_sheet.append(_styled_row(charts_sheet, [status, count], 'report_cell'))
+
+    pie_chart = PieChart()
+    pie_chart.add_data(Reference(charts_sheet, min_col=2, min_row=3, max_row=5), titles_from_data=True)
+    pie_chart.set_categories(Reference(charts_sheet, min_col=1, min_row=4, max_row=5))
+    pie_chart.title = "Distribuição: Serviços vs Insumos"
+    charts_sheet.add_chart(pie_chart, "D3")
+
+    if summary.by_status:
+        bar_chart = BarChart()
+        bar_chart.type = "col"
+        bar_chart.style = 10
+        bar_chart.title = "Distribuição por Status"
+        bar_chart.y_axis.title = 'Quantidade'
+        bar_chart.x_axis.title = 'Status'
+        bar_chart.add_data(Reference(charts_sheet, min_col=2, min_row=8, max_row=8 + len(summary.by_status)), titles_from_data=True)
+        bar_chart.set_categories(Reference(charts_sheet, min_col=1, min_row=9, max_row=8 + len(summary.by_status)))
+        charts_sheet.add_chart(bar_chart, "D20")
+
+    wb.save(file_path)
+
+def stream_excel_report(acquisitions, filters_description='', chunk_size=64 * 1024):
+    """Generator yielding the Excel report as bytes, for a chunked download.
+
+    An xlsx file is a zip archive whose directory is written last, so the
+    whole workbook is written to an artifact-store file before the first
+    byte goes out: time to first byte and disk use are those of the regular
+    export. What streaming buys is flat memory (write-only sheets, rows in
+    batches) and a chunked response body. The file is released when the
+    generator finishes or the client disconnects.
+    """
+    file_path = artifact_store.new_path('.xlsx', prefix='relatorio_')
+
+    try:
+        write_excel_report_streaming(acquisitions, file_path, filters_description=filters_description)
+        with open(file_path, 'rb') as report:
+            while True:
+                chunk = report.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        artifact_store.release(file_path)
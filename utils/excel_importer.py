@@ -1,95 +1,413 @@
-import pandas as pd
+"""
+Mapping-driven import of acquisitions from spreadsheets and CSV files.
+
+The file is streamed in chunks (see utils/spreadsheet_reader.py); every
+chunk is converted with vectorized pandas operations, validated (rows with
+unknown categories, bad values or dates are reported and left out) and
+bulk inserted together with the initial status history, with one commit per
+chunk so an interrupted import can resume (see utils/import_runs.py).
+"""
+
+import re
 from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
 from app import db
-from models import Acquisition, Category, CostCenter, AcquisitionType, AcquisitionStatus, User
+from models import Acquisition, Category, CostCenter, AcquisitionType, AcquisitionStatus, StatusHistory
+from utils.spending_rollup import apply_rollup_delta
+from utils.cache import response_cache
+from utils.import_mappings import build_mapping, normalize_label
+from utils.spreadsheet_reader import inspect_spreadsheet, iter_chunks
 
-def import_excel_acquisitions(file_path, user_id):
-    """Import acquisitions from Excel file"""
-    try:
-        # Read Excel with correct header row (row 2, 0-indexed)
-        df = pd.read_excel(file_path, header=2)
+# Status texts of the acquisitions spreadsheet (normalized), checked in order; the first match wins
+STATUS_KEYWORDS = [
+    (('nao iniciada',), AcquisitionStatus.EM_ANALISE),
+    (('orcamento', 'cotacao'), AcquisitionStatus.AGUARDANDO_ORCAMENTO),
+    (('iniciada', 'andamento'), AcquisitionStatus.EM_COTACAO),
+    (('concluida', 'finalizada'), AcquisitionStatus.RECEBIDO),
+]
+
+# Exact status names: enum values ("em_analise") and labels ("Em Análise", "Recebido/Concluído")
+STATUS_NAMES = {
+    **{status.value.replace('_', ' '): status for status in AcquisitionStatus},
+    'recebido/concluido': AcquisitionStatus.RECEBIDO,
+}
+
+TYPE_PREFIXES = [
+    ('servi', AcquisitionType.SERVICO),
+    ('insum', AcquisitionType.INSUMO),
+]
+
+ISO_DATE = r'^\d{4}-\d{2}-\d{2}'
+
+# Rows per INSERT statement / per IN (...) lookup
+IMPORT_BATCH_SIZE = 1000
+
+# Rows per committed chunk; an interrupted import resumes after the last one
+IMPORT_CHUNK_SIZE = 5000
+
+
+def _normalized(values):
+    """Vectorized normalize_label: lower case, no accents, stripped"""
+    return (values.astype(str).str.normalize('NFKD')
+            .str.encode('ascii', errors='ignore').str.decode('ascii')
+            .str.strip().str.lower())
+
+
+def _text(values):
+    """Stripped text of the present values, None elsewhere"""
+    return values.astype(str).str.strip().where(values.notna(), None)
+
+
+def map_statuses(statuses):
+    """Map a Series of status texts to AcquisitionStatus values (missing means not started)"""
+    statuses = _normalized(statuses.fillna('não iniciada'))
+    mapped = pd.Series(AcquisitionStatus.EM_ANALISE, index=statuses.index, dtype=object)
+    # Apply in reverse so earlier keywords override later ones
+    for keywords, status in reversed(STATUS_KEYWORDS):
+        mapped[statuses.str.contains('|'.join(keywords), regex=True)] = status
+    exact = statuses.map(STATUS_NAMES)
+    return exact.where(exact.notna(), mapped)
+
+
+def map_types(types, default):
+    """Map a Series of type texts to AcquisitionType values; returns (types, invalid mask)"""
+    present = types.notna()
+    normalized = _normalized(types.where(present, ''))
+    mapped = pd.Series(default, index=types.index, dtype=object)
+    matched = ~present
+    for prefix, acquisition_type in TYPE_PREFIXES:
+        is_type = present & normalized.str.startswith(prefix)
+        mapped[is_type] = acquisition_type
+        matched |= is_type
+    return mapped, ~matched
+
+
+def parse_amounts(values):
+    """Numbers or texts such as "R$ 1.234,56" / "1234.56" as Decimal; returns (amounts, invalid mask)"""
+    present = values.notna()
+    is_text = present & values.map(lambda value: isinstance(value, str))
+    amounts = pd.to_numeric(values.where(present & ~is_text), errors='coerce')
+    
+    text = values[is_text].astype(str).str.replace(r'[R$\s]', '', regex=True)
+    # Brazilian format: "." groups thousands and "," separates decimals
+    brazilian = text.str.contains(',', regex=False) | text.str.fullmatch(r'-?\d{1,3}(\.\d{3})+')
+    text = text.where(~brazilian, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    amounts[is_text] = pd.to_numeric(text, errors='coerce')
+    
+    invalid = present & amounts.isna()
+    return amounts.map(lambda value: None if pd.isna(value) else Decimal(str(round(value, 2)))), invalid
+
+
+def parse_dates(values, default):
+    """Dates, datetimes or texts ("dd/mm/aaaa", ISO) as datetime; returns (dates, invalid mask)"""
+    present = values.notna()
+    is_text = present & values.map(lambda value: isinstance(value, str))
+    dates = pd.to_datetime(values.where(present & ~is_text), errors='coerce')
+    
+    text = values[is_text].astype(str).str.strip()
+    iso = text.str.match(ISO_DATE)
+    dates[is_text & iso.reindex(values.index, fill_value=False)] = pd.to_datetime(
+        text[iso], format='ISO8601', errors='coerce')
+    dates[is_text & ~iso.reindex(values.index, fill_value=True)] = pd.to_datetime(
+        text[~iso], dayfirst=True, format='mixed', errors='coerce')
+    
+    invalid = present & dates.isna()
+    return dates.map(lambda value: default if pd.isna(value) else value.to_pydatetime()), invalid
+
+
+def existing_titles(titles):
+    """Titles (from the given ones) that already exist, looked up in batches"""
+    titles = list(titles)
+    found = set()
+    for start in range(0, len(titles), IMPORT_BATCH_SIZE):
+        batch = titles[start:start + IMPORT_BATCH_SIZE]
+        found.update(db.session.execute(
+            select(Acquisition.title).where(Acquisition.title.in_(batch))
+        ).scalars())
+    return found
+
+
+def _default_category():
+    default_category = Category.query.filter_by(name='Geral').first()
+    if not default_category:
+        default_category = Category(
+            name='Geral',
+            type=AcquisitionType.INSUMO,
+            description='Categoria padrão para importação'
+        )
+        db.session.add(default_category)
+        db.session.flush()
+    return default_category
+
+
+def _default_cost_center():
+    default_cost_center = CostCenter.query.filter_by(name='Geral').first()
+    if not default_cost_center:
+        default_cost_center = CostCenter(
+            name='Geral',
+            code='GERAL',
+            description='Centro de custo padrão'
+        )
+        db.session.add(default_cost_center)
+        db.session.flush()
+    return default_cost_center
+
+
+class ImportLookups:
+    """Categories and cost centers by normalized name (and code), with the import defaults"""
+    
+    def __init__(self, defaults):
+        self.categories = {normalize_label(c.name): c.id for c in Category.query.all()}
+        self.cost_centers = {normalize_label(c.name): c.id for c in CostCenter.query.all()}
+        self.cost_centers.update({normalize_label(c.code): c.id for c in CostCenter.query.all()})
+        
+        self.defaults = defaults
+        self.default_type = map_types(pd.Series([defaults['type']]), AcquisitionType.INSUMO)[0][0]
+        
+        category = normalize_label(defaults['category'])
+        if category not in self.categories and category == 'geral':
+            self.categories[category] = _default_category().id
+        if category not in self.categories:
+            raise ValueError(f"Categoria padrão não encontrada: {defaults['category']}")
+        self.default_category_id = self.categories[category]
+        
+        cost_center = normalize_label(defaults['cost_center'])
+        if cost_center not in self.cost_centers and cost_center == 'geral':
+            self.cost_centers[cost_center] = _default_cost_center().id
+        if cost_center not in self.cost_centers:
+            raise ValueError(f"Centro de custo padrão não encontrado: {defaults['cost_center']}")
+        self.default_cost_center_id = self.cost_centers[cost_center]
+    
+    @staticmethod
+    def _ids(values, ids, default):
+        present = values.notna()
+        mapped = _normalized(values.where(present, '')).map(ids)
+        invalid = present & mapped.isna()
+        return mapped.where(present, default).astype(object), invalid
+    
+    def category_ids(self, values):
+        return self._ids(values, self.categories, self.default_category_id)
+    
+    def cost_center_ids(self, values):
+        return self._ids(values, self.cost_centers, self.default_cost_center_id)
+
+
+def prepare_rows(df, lookups):
+    """Vectorized conversion of a chunk of records; returns (rows to insert, row errors)"""
+    defaults = lookups.defaults
+    now = datetime.now()
+    problems = pd.Series('', index=df.index)
+    
+    def report(invalid, message):
+        # Keep the first problem of every row
+        problems[invalid & (problems == '')] = message
+    
+    titles = _text(df['title'])
+    description = _text(df['description'])
+    quantity = pd.to_numeric(df['quantity'], errors='coerce')
+    
+    prepared = pd.DataFrame({
+        'title': titles.str[:200],
+        'description': description.where(description.notna(), 'Importado do Excel: ' + titles),
+        'status': map_statuses(df['status']),
+        'quantity': quantity.where(df['quantity'].notna(), defaults['quantity']),
+        'unit': _text(df['unit']).fillna(defaults['unit']),
+        'justification': _text(df['justification']).fillna(defaults['justification']),
+        'sheet': df['sheet'],
+        'line': df['line'],
+    }, index=df.index)
+    
+    prepared['type'], invalid = map_types(df['type'], lookups.default_type)
+    report(invalid, 'Tipo inválido')
+    prepared['category_id'], invalid = lookups.category_ids(df['category'])
+    report(invalid, 'Categoria não encontrada')
+    prepared['cost_center_id'], invalid = lookups.cost_center_ids(df['cost_center'])
+    report(invalid, 'Centro de custo não encontrado')
+    prepared['estimated_value'], invalid = parse_amounts(df['estimated_value'])
+    report(invalid, 'Valor estimado inválido')
+    prepared['final_value'], invalid = parse_amounts(df['final_value'])
+    report(invalid, 'Valor final inválido')
+    prepared['created_at'], invalid = parse_dates(df['created_at'], now)
+    report(invalid, 'Data inválida')
+    report(prepared['quantity'].isna() | (prepared['quantity'] % 1 != 0), 'Quantidade inválida')
+    
+    failed = problems != ''
+    errors = [
+        row_error(sheet, line, f"{message}: {value}")
+        for sheet, line, message, value in zip(
+            df['sheet'][failed], df['line'][failed], problems[failed],
+            _bad_values(df[failed], problems[failed])
+        )
+    ]
+    return prepared[~failed], errors
+
+
+# Field whose value is quoted in each row error message
+PROBLEM_FIELDS = {
+    'Tipo inválido': 'type',
+    'Categoria não encontrada': 'category',
+    'Centro de custo não encontrado': 'cost_center',
+    'Valor estimado inválido': 'estimated_value',
+    'Valor final inválido': 'final_value',
+    'Data inválida': 'created_at',
+    'Quantidade inválida': 'quantity',
+}
+
+
+def _bad_values(df, problems):
+    return [df.at[index, PROBLEM_FIELDS[message]] for index, message in problems.items()]
+
+
+def row_error(sheet, line, message):
+    return {'sheet': sheet, 'row': int(line), 'error': message}
+
+
+def format_row_error(error):
+    location = f"Aba {error['sheet']}, linha {error['row']}" if error.get('sheet') else f"Linha {error['row']}"
+    return f"{location}: {error['error']}"
+
+
+def insert_acquisitions(df, user_id):
+    """Bulk insert prepared rows (see prepare_rows) with their initial status history"""
+    imported_count = 0
+    deltas = {}
+    
+    for start in range(0, len(df), IMPORT_BATCH_SIZE):
+        batch = df.iloc[start:start + IMPORT_BATCH_SIZE]
+        # created_at is the spreadsheet's request date; updated_at is when the row entered
+        # the system, so incremental exports (updated_since) pick imported rows up
+        imported_at = datetime.now()
+        rows = [
+            {
+                'title': title,
+                'description': description,
+                'type': acquisition_type,
+                'status': status,
+                'justification': justification,
+                'requester_id': user_id,
+                'category_id': int(category_id),
+                'cost_center_id': int(cost_center_id),
+                'quantity': int(quantity),
+                'unit': unit,
+                'estimated_value': estimated_value,
+                'final_value': final_value,
+                'created_at': created_at,
+                'updated_at': imported_at,
+            }
+            for (title, description, acquisition_type, status, justification, category_id, cost_center_id,
+                 quantity, unit, estimated_value, final_value, created_at) in zip(
+                batch['title'], batch['description'], batch['type'], batch['status'], batch['justification'],
+                batch['category_id'], batch['cost_center_id'], batch['quantity'], batch['unit'],
+                batch['estimated_value'], batch['final_value'], batch['created_at'])
+        ]
         
-        # Clean column names
-        df.columns = ['numero', 'descricao', 'responsavel_cotacao', 'status']
+        inserted = db.session.execute(
+            insert(Acquisition).returning(Acquisition.id, sort_by_parameter_order=True),
+            rows
+        ).scalars().all()
         
-        # Remove empty rows
-        df = df.dropna(subset=['numero', 'descricao'])
+        db.session.execute(insert(StatusHistory), [
+            {
+                'acquisition_id': acquisition_id,
+                'user_id': user_id,
+                'new_status': row['status'],
+                'comment': "Importado do arquivo Excel",
+                'created_at': row['created_at'],
+            }
+            for acquisition_id, row in zip(inserted, rows)
+        ])
+        imported_count += len(inserted)
         
-        # Get or create default category and cost center
-        default_category = Category.query.filter_by(name='Geral').first()
-        if not default_category:
-            default_category = Category(
-                name='Geral',
-                type=AcquisitionType.INSUMO,
-                description='Categoria padrão para importação'
-            )
-            db.session.add(default_category)
-            db.session.flush()
+        for row in rows:
+            key = (row['created_at'].year, row['created_at'].month, row['type'], row['cost_center_id'])
+            count, sum_final, sum_estimated = deltas.get(key, (0, Decimal('0'), Decimal('0')))
+            deltas[key] = (count + 1,
+                           sum_final + (row['final_value'] or 0),
+                           sum_estimated + (row['estimated_value'] or 0))
+    
+    for key, (count, sum_final, sum_estimated) in deltas.items():
+        apply_rollup_delta(key, count, sum_final, sum_estimated)
+    
+    return imported_count
+
+
+def import_chunk(df, user_id):
+    """Import one chunk of prepared rows; returns (imported, skipped, row errors)"""
+    # Duplicates (in the chunk, or already stored by this or earlier imports) are skipped
+    new_rows = df.drop_duplicates(subset='title')
+    new_rows = new_rows[~new_rows['title'].isin(existing_titles(new_rows['title']))]
+    skipped = len(df) - len(new_rows)
+    
+    try:
+        with db.session.begin_nested():
+            return insert_acquisitions(new_rows, user_id), skipped, []
+    except SQLAlchemyError:
+        pass
+    
+    # The batch failed: insert row by row so only the bad rows are lost
+    imported = 0
+    errors = []
+    for position in range(len(new_rows)):
+        row = new_rows.iloc[position:position + 1]
+        try:
+            with db.session.begin_nested():
+                imported += insert_acquisitions(row, user_id)
+        except SQLAlchemyError as e:
+            errors.append(row_error(row['sheet'].iloc[0], row['line'].iloc[0], str(getattr(e, 'orig', e))))
+    return imported, skipped, errors
+
+
+def import_excel_acquisitions(file_path, user_id, plan=None, start_row=0, chunk_size=IMPORT_CHUNK_SIZE,
+                              progress=None):
+    """Import acquisitions from a spreadsheet or CSV file, committing after every chunk of rows.
+    
+    `plan` is the import plan built by the preview (built with the default
+    layout if not given), `start_row` resumes an interrupted import and
+    `progress(rows_done, total_rows, imported, skipped, errors)` is called for
+    every chunk right before its commit.
+    """
+    try:
+        if plan is None:
+            plan, preview = inspect_spreadsheet(file_path, build_mapping(), limit=0)
+        total_rows = plan.get('estimated_rows')
         
-        default_cost_center = CostCenter.query.filter_by(name='Geral').first()
-        if not default_cost_center:
-            default_cost_center = CostCenter(
-                name='Geral',
-                code='GERAL',
-                description='Centro de custo padrão'
-            )
-            db.session.add(default_cost_center)
-            db.session.flush()
+        lookups = ImportLookups(plan['defaults'])
+        db.session.commit()
         
+        rows_done = start_row
         imported_count = 0
+        skipped_count = 0
         errors = []
         
-        for index, row in df.iterrows():
-            try:
-                # Map status from Excel to system status
-                excel_status = str(row['status']).lower() if pd.notna(row['status']) else 'não iniciada'
-                
-                if 'não iniciada' in excel_status:
-                    system_status = AcquisitionStatus.EM_ANALISE
-                elif 'orçamento' in excel_status or 'cotação' in excel_status:
-                    system_status = AcquisitionStatus.AGUARDANDO_ORCAMENTO
-                elif 'iniciada' in excel_status or 'andamento' in excel_status:
-                    system_status = AcquisitionStatus.EM_COTACAO
-                elif 'concluída' in excel_status or 'finalizada' in excel_status:
-                    system_status = AcquisitionStatus.RECEBIDO
-                else:
-                    system_status = AcquisitionStatus.EM_ANALISE
-                
-                # Check if acquisition already exists
-                existing = Acquisition.query.filter_by(
-                    title=str(row['descricao'])[:200]
-                ).first()
-                
-                if existing:
-                    continue  # Skip duplicates
-                
-                # Create new acquisition
-                acquisition = Acquisition(
-                    title=str(row['descricao'])[:200],
-                    description=f"Importado do Excel: {row['descricao']}",
-                    type=AcquisitionType.INSUMO,  # Default to supplies
-                    status=system_status,
-                    justification="Importado do arquivo Excel de aquisições",
-                    requester_id=user_id,
-                    category_id=default_category.id,
-                    cost_center_id=default_cost_center.id,
-                    quantity=1,
-                    unit='un'
-                )
-                
-                db.session.add(acquisition)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Linha {index + 3}: {str(e)}")
-                continue
+        for chunk in iter_chunks(file_path, plan, chunk_size, start_row):
+            prepared, chunk_errors = prepare_rows(chunk, lookups)
+            imported, skipped, insert_errors = import_chunk(prepared, user_id)
+            chunk_errors += insert_errors
+            
+            rows_done += len(chunk)
+            imported_count += imported
+            skipped_count += skipped
+            errors.extend(chunk_errors)
+            
+            if progress:
+                progress(rows_done, max(total_rows, rows_done) if total_rows else None, imported, skipped, chunk_errors)
+            db.session.commit()
+            response_cache.bump_version()
         
-        db.session.commit()
+        # The estimate counts blank rows; report the real total at the end
+        if progress:
+            progress(rows_done, rows_done, 0, 0, [])
+            db.session.commit()
         
         return {
             'success': True,
             'imported_count': imported_count,
-            'errors': errors
+            'skipped_count': skipped_count,
+            'errors': [format_row_error(error) for error in errors]
         }
         
     except Exception as e:
@@ -99,29 +417,37 @@ def import_excel_acquisitions(file_path, user_id):
             'error': str(e)
         }
 
-def parse_excel_preview(file_path):
-    """Preview Excel file content before import"""
+
+def parse_excel_preview(file_path, mapping=None, limit=10):
+    """Preview the file before import; reads only the header and the first rows"""
     try:
-        df = pd.read_excel(file_path, header=2)
-        df.columns = ['numero', 'descricao', 'responsavel_cotacao', 'status']
-        df = df.dropna(subset=['numero', 'descricao'])
+        plan, records = inspect_spreadsheet(file_path, mapping or build_mapping(), limit=limit)
+        if not plan['sheets']:
+            missing = ', '.join(sorted({field for sheet in plan['skipped_sheets'] for field in sheet['missing']}))
+            raise ValueError(f"Nenhuma aba com as colunas obrigatórias ({missing}).")
         
         preview = []
-        for index, row in df.head(10).iterrows():
+        for record in records:
             preview.append({
-                'numero': row['numero'],
-                'descricao': str(row['descricao'])[:100],
-                'status': str(row['status']) if pd.notna(row['status']) else 'Não informado'
+                'sheet': record['sheet'],
+                'line': record['line'],
+                'numero': record.get('numero'),
+                'title': str(record['title'])[:100],
+                'status': str(record['status']) if record.get('status') is not None else 'Não informado',
+                'category': record.get('category'),
+                'cost_center': record.get('cost_center'),
+                'estimated_value': record.get('estimated_value'),
             })
         
         return {
             'success': True,
-            'total_rows': len(df),
-            'preview': preview
+            'total_rows': plan['estimated_rows'],
+            'preview': preview,
+            'plan': plan
         }
         
     except Exception as e:
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,141 @@
+"""
+Declarative column mappings for the acquisitions importer.
+
+A mapping says where each import field comes from and which values to use
+when the file doesn't have it:
+
+    {
+        "sheets": "all",          # "first", "all" or a list of sheet names (ignored for CSV)
+        "header_row": 0,          # 0-based line of the header
+        "columns": {              # field: header label or 0-based column position
+            "title": "Título",
+            "category": "Categoria",
+            "estimated_value": 7
+        },
+        "required": ["title"],    # rows missing one of these are ignored
+        "defaults": {"type": "insumo", "category": "Geral", "cost_center": "GERAL"}
+    }
+
+Named layouts cover the files we receive regularly; a custom mapping can be
+given as JSON on the import page.
+"""
+
+import json
+import unicodedata
+
+IMPORT_FIELDS = {
+    'numero': 'Número na planilha',
+    'title': 'Título',
+    'description': 'Descrição',
+    'type': 'Tipo (serviço/insumo)',
+    'status': 'Status',
+    'category': 'Categoria (nome)',
+    'cost_center': 'Centro de custo (código ou nome)',
+    'quantity': 'Quantidade',
+    'unit': 'Unidade',
+    'estimated_value': 'Valor estimado',
+    'final_value': 'Valor final',
+    'created_at': 'Data da solicitação',
+    'justification': 'Justificativa',
+}
+
+DEFAULT_VALUES = {
+    'type': 'insumo',
+    'category': 'Geral',
+    'cost_center': 'GERAL',
+    'quantity': 1,
+    'unit': 'un',
+    'justification': 'Importado do arquivo Excel de aquisições',
+}
+
+IMPORT_LAYOUTS = {
+    'planilha_aquisicoes': {
+        'label': 'Planilha de aquisições (nº, descrição, responsável, status)',
+        'sheets': 'first',
+        'header_row': 2,
+        'columns': {'numero': 0, 'title': 1, 'status': 3},
+        'required': ['numero', 'title'],
+    },
+    'exportacao_detalhada': {
+        'label': 'Exportação detalhada / outros campi (CSV ou várias abas)',
+        'sheets': 'all',
+        'header_row': 0,
+        'columns': {
+            'title': 'Título',
+            'description': 'Descrição',
+            'type': 'Tipo',
+            'status': 'Status',
+            'category': 'Categoria',
+            'cost_center': 'Centro de Custo',
+            'quantity': 'Quantidade',
+            'unit': 'Unidade',
+            'estimated_value': 'Valor Estimado',
+            'final_value': 'Valor Final',
+            'created_at': 'Data Solicitação',
+            'justification': 'Justificativa',
+        },
+        'required': ['title'],
+    },
+}
+
+DEFAULT_LAYOUT = 'planilha_aquisicoes'
+
+
+def normalize_label(value):
+    """Case- and accent-insensitive form of a header label or lookup value"""
+    text = unicodedata.normalize('NFKD', str(value))
+    return ''.join(char for char in text if not unicodedata.combining(char)).strip().lower()
+
+
+def build_mapping(layout=None, custom_json=None):
+    """Mapping for a named layout or a custom JSON mapping; raises ValueError with a user-facing message"""
+    if custom_json and custom_json.strip():
+        try:
+            mapping = json.loads(custom_json)
+        except ValueError:
+            raise ValueError('Mapeamento personalizado não é um JSON válido.')
+        if not isinstance(mapping, dict):
+            raise ValueError('Mapeamento personalizado deve ser um objeto JSON.')
+    else:
+        if (layout or DEFAULT_LAYOUT) not in IMPORT_LAYOUTS:
+            raise ValueError('Layout de importação inválido.')
+        mapping = dict(IMPORT_LAYOUTS[layout or DEFAULT_LAYOUT])
+        mapping.pop('label', None)
+
+    columns = mapping.get('columns')
+    if not isinstance(columns, dict) or not columns:
+        raise ValueError('O mapeamento deve definir "columns".')
+    unknown = set(columns) - set(IMPORT_FIELDS)
+    if unknown:
+        raise ValueError(f"Campos desconhecidos no mapeamento: {', '.join(sorted(unknown))}")
+    if 'title' not in columns:
+        raise ValueError('O mapeamento deve indicar a coluna do título ("title").')
+
+    sheets = mapping.get('sheets', 'first')
+    if sheets not in ('first', 'all') and not (isinstance(sheets, list) and sheets):
+        raise ValueError('"sheets" deve ser "first", "all" ou uma lista de abas.')
+
+    try:
+        header_row = int(mapping.get('header_row', 0))
+    except (TypeError, ValueError):
+        raise ValueError('"header_row" deve ser um número.')
+
+    return {
+        'sheets': sheets,
+        'header_row': header_row,
+        'columns': columns,
+        'required': [field for field in mapping.get('required', ['title']) if field in columns],
+        'defaults': {**DEFAULT_VALUES, **mapping.get('defaults', {})},
+    }
+
+
+def resolve_columns(columns, header):
+    """Map each field to a column position of this header; fields whose label is missing are left out"""
+    positions = {normalize_label(label): position for position, label in enumerate(header) if label is not None}
+    resolved = {}
+    for field, source in columns.items():
+        if isinstance(source, int):
+            resolved[field] = source
+        elif normalize_label(source) in positions:
+            resolved[field] = positions[normalize_label(source)]
+    return resolved
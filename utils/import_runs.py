@@ -0,0 +1,126 @@
+"""
+Background, resumable acquisition imports (spreadsheets and CSV).
+
+Confirming an import creates an ImportRun and processes the spreadsheet on
+a local thread pool (IMPORT_WORKERS, default 1), committing every chunk
+together with the run's progress. The client polls the run status; a run
+that failed (or whose worker died) can be resumed and continues after the
+last committed chunk.
+"""
+
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app import app, db
+from models import ImportRun
+from utils.excel_importer import import_excel_acquisitions
+from utils.artifact_store import artifact_store
+
+# Row errors kept on the run record; the counters still include the rest
+MAX_ROW_ERRORS = 1000
+
+# A queued or running import without progress for this long lost its worker
+STALE_AFTER = timedelta(minutes=15)
+
+
+class ImportRunner:
+    """Runs imports on a local thread pool and tracks them in the database"""
+
+    def __init__(self, max_workers=1):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='import-run')
+
+    def submit(self, file_path, user_id, plan=None):
+        run = ImportRun(file_path=file_path, column_mapping=json.dumps(plan) if plan else None,
+                        status='pending', requested_by_id=user_id)
+        db.session.add(run)
+        db.session.commit()
+
+        self.executor.submit(self._run, run.id)
+        return run
+
+    def can_resume(self, run):
+        if run.status == 'failed':
+            return True
+        # Runs still queued when their process died stay pending
+        return run.status in ('pending', 'running') and run.updated_at < datetime.now() - STALE_AFTER
+
+    def resume(self, run):
+        """Restart a failed or interrupted run after its last committed chunk"""
+        if not self.can_resume(run):
+            raise ValueError('Esta importação não pode ser retomada.')
+        if not os.path.exists(run.file_path):
+            raise ValueError('Arquivo da importação não está mais disponível. Envie-o novamente.')
+
+        run.status = 'pending'
+        run.error = None
+        db.session.commit()
+
+        self.executor.submit(self._run, run.id)
+        return run
+
+    def _run(self, run_id):
+        with app.app_context():
+            run = db.session.get(ImportRun, run_id)
+            # Already picked up by a resume of the same run
+            if run is None or run.status != 'pending':
+                return
+
+            run.status = 'running'
+            run.started_at = run.started_at or datetime.now()
+            db.session.commit()
+
+            def progress(rows_done, total_rows, imported, skipped, errors):
+                run.rows_done = rows_done
+                run.total_rows = total_rows
+                run.rows_imported += imported
+                run.rows_skipped += skipped
+                run.rows_failed += len(errors)
+                if errors:
+                    row_errors = json.loads(run.row_errors or '[]')
+                    row_errors.extend(errors[:MAX_ROW_ERRORS - len(row_errors)])
+                    run.row_errors = json.dumps(row_errors, ensure_ascii=False)
+
+            try:
+                result = import_excel_acquisitions(
+                    run.file_path, run.requested_by_id,
+                    plan=json.loads(run.column_mapping) if run.column_mapping else None,
+                    start_row=run.rows_done, progress=progress
+                )
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+
+            run = db.session.get(ImportRun, run_id)
+            if result['success']:
+                run.status = 'done'
+                artifact_store.release(run.file_path)
+            else:
+                logging.error(f"Import run {run_id} failed: {result['error']}")
+                run.status = 'failed'
+                run.error = result['error']
+
+            run.finished_at = datetime.now()
+            db.session.commit()
+            db.session.remove()
+
+
+def import_run_status(run):
+    return {
+        'id': run.id,
+        'status': run.status,
+        'total_rows': run.total_rows,
+        'rows_done': run.rows_done,
+        'rows_imported': run.rows_imported,
+        'rows_skipped': run.rows_skipped,
+        'rows_failed': run.rows_failed,
+        'row_errors': json.loads(run.row_errors or '[]'),
+        'error': run.error,
+        'created_at': run.created_at.isoformat() if run.created_at else None,
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+# Global instance
+import_runs = ImportRunner(max_workers=int(os.environ.get('IMPORT_WORKERS', '1')))
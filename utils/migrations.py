@@ -0,0 +1,126 @@
+"""
+Versioned schema migrations.
+
+db.create_all() only creates missing tables, so anything that changes an
+existing table (new indexes, new columns) is registered here with an
+increasing version number. Applied versions are recorded in the
+schema_migrations table and each migration runs exactly once.
+"""
+
+import logging
+from sqlalchemy import inspect, text
+
+from app import db
+from models import SchemaMigration
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register a migration function under the given version"""
+    def decorator(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return decorator
+
+
+def create_missing_indexes(connection, model, index_names):
+    """Create the named indexes declared on the model if they don't exist yet"""
+    existing = {index['name'] for index in inspect(connection).get_indexes(model.__tablename__)}
+    for index in model.__table__.indexes:
+        if index.name in index_names and index.name not in existing:
+            logging.info(f"Creating index {index.name}")
+            index.create(bind=connection)
+
+
+@migration(1, 'Indexes for acquisition listing, dashboard and history lookups')
+def add_acquisition_indexes(connection):
+    from models import Acquisition, StatusHistory, Document
+
+    create_missing_indexes(connection, Acquisition, {
+        'ix_acquisitions_created_at_id',
+        'ix_acquisitions_type_created_at',
+        'ix_acquisitions_status_created_at',
+        'ix_acquisitions_category_created_at',
+        'ix_acquisitions_requester_created_at',
+        'ix_acquisitions_cost_center_id',
+        'ix_acquisitions_status_type',
+    })
+    create_missing_indexes(connection, StatusHistory, {'ix_status_history_acquisition_created_at'})
+    create_missing_indexes(connection, Document, {'ix_documents_acquisition_id'})
+
+
+def add_missing_columns(connection, model, column_names):
+    """Add the named columns declared on the model if the table doesn't have them yet"""
+    existing = {column['name'] for column in inspect(connection).get_columns(model.__tablename__)}
+    for name in column_names:
+        if name in existing:
+            continue
+        column = model.__table__.c[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        logging.info(f"Adding column {model.__tablename__}.{name}")
+        connection.execute(text(f"ALTER TABLE {model.__tablename__} ADD COLUMN {name} {column_type}"))
+
+
+def run_migrations():
+    """Apply every registered migration that has not been applied yet"""
+    applied = {row.version for row in SchemaMigration.query.all()}
+
+    for version, name, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+
+        try:
+            with db.engine.begin() as connection:
+                func(connection)
+            db.session.add(SchemaMigration(version=version, name=name))
+            db.session.commit()
+            logging.info(f"Applied migration {version}: {name}")
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Migration {version} ({name}) failed: {e}")
+            raise
+
+
+@migration(2, 'Backfill the monthly spending rollup')
+def backfill_spending_rollup(connection):
+    from utils.spending_rollup import rebuild_rollup
+
+    rebuild_rollup(connection)
+
+
+@migration(3, 'Full-text search index over acquisitions')
+def add_search_index(connection):
+    from utils.search import create_search_index
+
+    create_search_index(connection)
+
+
+@migration(4, 'Index on acquisitions.updated_at for incremental exports')
+def add_updated_at_index(connection):
+    from models import Acquisition
+
+    create_missing_indexes(connection, Acquisition, {'ix_acquisitions_updated_at_id'})
+
+
+@migration(5, 'Column mapping on import runs')
+def add_import_run_column_mapping(connection):
+    from models import ImportRun
+
+    add_missing_columns(connection, ImportRun, ['column_mapping'])
+
+
+@migration(6, 'Notification preference on users')
+def add_user_notification_mode(connection):
+    from models import User
+
+    add_missing_columns(connection, User, ['notification_mode'])
+
+
+@migration(7, 'Cost center index for filtered report date ranges')
+def add_cost_center_created_at_index(connection):
+    from models import Acquisition
+
+    create_missing_indexes(connection, Acquisition, {'ix_acquisitions_cost_center_created_at'})
+    # Superseded: the new index leads with cost_center_id as well
+    connection.execute(text('DROP INDEX IF EXISTS ix_acquisitions_cost_center_id'))
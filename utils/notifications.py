@@ -0,0 +1,190 @@
+"""
+Acquisition notifications, sent immediately or as a daily digest.
+
+Every user chooses how to be notified (User.notification_mode). Users in
+'immediate' mode get one email per event as before. For users in 'digest'
+mode the event is recorded in the notification_outbox table instead, and
+the daily digest job sends each of them a single email with:
+
+- acquisitions still waiting for their approval,
+- budgets past their budget_deadline (all of them for approvers, their
+  own requests for everybody else),
+- recently received items and other status changes of their requests.
+
+The job runs outside the web workers, once a day, e.g. from cron:
+
+    flask --app main send-digests
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from sqlalchemy.orm import joinedload
+
+from app import app, db
+from models import Acquisition, AcquisitionStatus, NotificationEvent, User, UserRole
+from utils.email_service import email_service
+
+NOTIFICATION_MODES = {
+    'immediate': 'Um e-mail por evento',
+    'digest': 'Resumo diário',
+}
+
+# Statuses in which a budget is still expected from the supplier
+AWAITING_BUDGET_STATUSES = (AcquisitionStatus.AGUARDANDO_ORCAMENTO, AcquisitionStatus.EM_COTACAO)
+
+# Longer digest sections are cut, with a count of the items left out
+DIGEST_SECTION_LIMIT = 50
+
+
+def _dispatch(users, event, send_immediately):
+    """Queue an email for immediate users and record an outbox event for digest users"""
+    immediate = [user for user in users if not user.wants_digest()]
+    digest = [user for user in users if user.wants_digest()]
+
+    for user in digest:
+        db.session.add(NotificationEvent(recipient_id=user.id, **event))
+    if digest:
+        db.session.commit()
+
+    if immediate:
+        send_immediately([(user.email, user.full_name) for user in immediate])
+
+
+def notify_approval_request(acquisition):
+    """Tell the approvers that a new acquisition is waiting for them"""
+    if not email_service.enabled:
+        return
+
+    try:
+        approvers = User.query.filter(
+            User.role.in_([UserRole.ADMIN, UserRole.APROVADOR]),
+            User.active == True,
+            User.approved == True
+        ).all()
+        _dispatch(
+            approvers,
+            {'acquisition_id': acquisition.id, 'kind': 'approval_request'},
+            lambda recipients: email_service.send_approval_requests(acquisition, recipients)
+        )
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error notifying approvers of acquisition {acquisition.id}: {e}")
+
+
+def notify_status_change(acquisition, changed_by):
+    """Tell the requester that the acquisition status changed (unless they changed it)"""
+    if not email_service.enabled:
+        return
+
+    requester = acquisition.requester
+    if requester.id == changed_by.id or not requester.active:
+        return
+
+    try:
+        _dispatch(
+            [requester],
+            {'acquisition_id': acquisition.id, 'kind': 'status_change', 'new_status': acquisition.status},
+            lambda recipients: email_service.send_status_notifications(acquisition, acquisition.status.value,
+                                                                       recipients)
+        )
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error notifying status change of acquisition {acquisition.id}: {e}")
+
+
+def _section(items):
+    return {'items': items[:DIGEST_SECTION_LIMIT], 'more': max(len(items) - DIGEST_SECTION_LIMIT, 0)}
+
+
+def build_digest(user, events, overdue_budgets):
+    """Digest sections for one user, from their unsent events and the overdue budgets"""
+    pending_approvals = {}
+    received = {}
+    updates = {}
+    for event in events:
+        acquisition = event.acquisition
+        if event.kind == 'approval_request':
+            # Requests approved (or moved on) in the meantime are no longer pending
+            if acquisition.status == AcquisitionStatus.EM_ANALISE:
+                pending_approvals[acquisition.id] = acquisition
+        elif event.new_status == AcquisitionStatus.RECEBIDO:
+            received[acquisition.id] = acquisition
+        else:
+            updates[acquisition.id] = acquisition
+
+    if not user.can_approve():
+        overdue_budgets = [acquisition for acquisition in overdue_budgets if acquisition.requester_id == user.id]
+    for acquisition_id in received:
+        updates.pop(acquisition_id, None)
+
+    return {
+        'pending_approvals': _section(list(pending_approvals.values())),
+        'overdue_budgets': _section(overdue_budgets),
+        'received': _section(list(received.values())),
+        'updates': _section(list(updates.values())),
+    }
+
+
+def send_digests(now=None):
+    """Send one digest per digest-mode user and mark their outbox events as sent"""
+    if not email_service.enabled:
+        return {'success': False, 'error': 'Serviço de e-mail não configurado'}
+
+    now = now or datetime.now()
+
+    events = NotificationEvent.query.options(
+        joinedload(NotificationEvent.acquisition)
+    ).filter(NotificationEvent.sent_at.is_(None)).order_by(NotificationEvent.created_at).all()
+    events_by_user = defaultdict(list)
+    for event in events:
+        events_by_user[event.recipient_id].append(event)
+
+    # One query for everybody; each digest keeps the rows its recipient may see
+    overdue_budgets = Acquisition.query.options(joinedload(Acquisition.requester)).filter(
+        Acquisition.status.in_(AWAITING_BUDGET_STATUSES),
+        Acquisition.budget_deadline < now,
+        Acquisition.budget_received_at.is_(None)
+    ).order_by(Acquisition.budget_deadline).all()
+
+    # Users who went back to immediate mode still get the events recorded before
+    users = User.query.filter(
+        User.active == True,
+        User.approved == True,
+        (User.notification_mode == 'digest') | User.id.in_(list(events_by_user))
+    ).all()
+
+    digests_sent = 0
+    for user in users:
+        user_events = events_by_user.pop(user.id, [])
+        digest = build_digest(user, user_events, overdue_budgets)
+        if any(section['items'] for section in digest.values()):
+            if not email_service.send_digest(user.email, user.full_name, digest, now):
+                continue
+            digests_sent += 1
+        for event in user_events:
+            event.sent_at = now
+
+    # Events of users who were deactivated meanwhile are dropped
+    for user_events in events_by_user.values():
+        for event in user_events:
+            event.sent_at = now
+
+    db.session.commit()
+    logging.info(f"Sent {digests_sent} notification digests covering {len(events)} events")
+    return {'success': True, 'digests': digests_sent, 'events': len(events)}
+
+
+@app.cli.command('send-digests')
+@click.option('--timeout', default=600.0, help='Seconds to wait for the emails to be delivered')
+def send_digests_command(timeout):
+    """Send the daily notification digests"""
+    result = send_digests()
+    if not result['success']:
+        raise click.ClickException(result['error'])
+
+    if not email_service.queue.flush(timeout):
+        raise click.ClickException('Tempo esgotado aguardando o envio dos e-mails')
+    click.echo(f"{result['digests']} resumos enviados ({result['events']} eventos)")
@@ -0,0 +1,109 @@
+"""
+Keyset (cursor) pagination for listings ordered by (created_at desc, id desc).
+
+Unlike OFFSET pagination the cost of a page does not grow with its depth
+and no COUNT(*) is needed. Cursors are opaque url-safe strings encoding the
+boundary row and the direction to move in.
+"""
+
+import base64
+import json
+import logging
+from datetime import datetime
+from sqlalchemy import tuple_
+
+from app import db
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total  # approximate, may be None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(item, direction):
+    payload = json.dumps([item.created_at.isoformat(), item.id, direction])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id, direction); raises ValueError on a malformed cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(created_at), int(item_id), direction
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def keyset_paginate(query, model, cursor=None, per_page=20, total=None):
+    """Paginate a query newest-first on (model.created_at, model.id)"""
+    key = tuple_(model.created_at, model.id)
+    direction = 'next'
+
+    if cursor:
+        created_at, item_id, direction = decode_cursor(cursor)
+        boundary = tuple_(created_at, item_id)
+        if direction == 'next':
+            query = query.filter(key < boundary)
+        else:
+            query = query.filter(key > boundary)
+
+    if direction == 'next':
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    # Fetch one extra row to know whether there is another page
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == 'prev':
+        rows.reverse()
+        has_next = bool(rows)
+        has_prev = has_more
+    else:
+        has_next = has_more
+        has_prev = bool(cursor) and bool(rows)
+
+    return KeysetPage(
+        rows,
+        per_page,
+        next_cursor=encode_cursor(rows[-1], 'next') if rows and has_next else None,
+        prev_cursor=encode_cursor(rows[0], 'prev') if rows and has_prev else None,
+        total=total
+    )
+
+
+def approximate_count(query):
+    """Row estimate from the PostgreSQL planner, exact count on other databases"""
+    statement = query.order_by(None).statement
+
+    if db.engine.dialect.name == 'postgresql':
+        try:
+            compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+            plan = db.session.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}").scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception as e:
+            logging.warning(f"Could not estimate row count from planner: {e}")
+            return None
+
+    return query.order_by(None).count()
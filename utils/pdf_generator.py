@@ -1,5 +1,4 @@
 import os
-import tempfile
 from datetime import datetime
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
@@ -7,29 +6,112 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.graphics.shapes import Drawing, Rect
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.graphics.charts.barcharts import VerticalBarChart
-from reportlab.graphics import renderPDF
-from sqlalchemy import func
-from models import AcquisitionType, AcquisitionStatus
-from app import db
+from reportlab.platypus.flowables import Flowable
+from itertools import islice
+from xml.sax.saxutils import escape
+from models import Acquisition, AcquisitionType
+from utils.artifact_store import artifact_store
+from utils.report_data import report_summary, report_rows
+from utils.report_charts import report_charts
 
-def generate_report_pdf(acquisitions):
-    """Generate a professional PDF report with acquisition data"""
+# Rows of the detail table in the default (preview) mode
+PREVIEW_ROWS = 50
+
+DETAIL_HEADER = ['ID', 'Título', 'Tipo', 'Status', 'Solicitante', 'Valor', 'Data']
+DETAIL_COL_WIDTHS = [0.5*inch, 1.5*inch, 0.8*inch, 1*inch, 1*inch, 0.8*inch, 0.8*inch]
+
+def _truncate(text, length):
+    # One line per row: the chunked table relies on a fixed row height
+    text = ' '.join(str(text).split())
+    return text[:length] + ('...' if len(text) > length else '')
+
+def _detail_cells(row):
+    """Table cells of one ReportRow"""
+    return [
+        str(row.id),
+        _truncate(row.title, 30),
+        row.type_label,
+        row.status_label,
+        _truncate(row.requester, 20),
+        f'R$ {row.final_value:,.2f}' if row.final_value else 'N/A',
+        row.created_at.strftime('%d/%m/%Y') if row.created_at else ''
+    ]
+
+class ChunkedTable(Flowable):
+    """Table over an iterator of rows of any length, built one page at a time.
+
+    The flowable never fits, so the frame asks it to split: split() pulls just
+    enough rows for the space left on the page into a regular Table (with the
+    header repeated) and returns it followed by a ChunkedTable for the rest.
+    Only one page of rows is in memory at a time.
+    """
+
+    def __init__(self, header, rows, col_widths, style, row_heights=None, pending=None):
+        Flowable.__init__(self)
+        self.header = header
+        self.rows = rows
+        self.col_widths = col_widths
+        self.style = style
+        self.row_heights = row_heights
+        self.pending = pending
+
+    def _peek(self):
+        if self.pending is None:
+            self.pending = next(self.rows, None)
+        return self.pending
+
+    def _measure(self, avail_width):
+        # Header and row heights, from a table with the first row (rows are single-line)
+        if self.row_heights is None:
+            sample = Table([self.header, self.pending], colWidths=self.col_widths)
+            sample.setStyle(self.style)
+            sample.wrap(avail_width, 10**6)
+            self.row_heights = (sample._rowHeights[0], max(sample._rowHeights[1], 1))
+        return self.row_heights
+
+    def wrap(self, avail_width, avail_height):
+        if self._peek() is None:
+            return (0, 0)
+        return (sum(self.col_widths), avail_height + 1)
+
+    def split(self, avail_width, avail_height):
+        if self._peek() is None:
+            return []
+        header_height, row_height = self._measure(avail_width)
+        count = int((avail_height - header_height) // row_height)
+        if count < 1:
+            return []
+
+        chunk = [self.pending] + list(islice(self.rows, count - 1))
+        table = Table([self.header] + chunk, colWidths=self.col_widths, repeatRows=1)
+        table.setStyle(self.style)
+        return [table, ChunkedTable(self.header, self.rows, self.col_widths, self.style, self.row_heights)]
+
+    def draw(self):
+        pass
+
+def generate_report_pdf(query, full_detail=False, filters_description=''):
+    """Generate a professional PDF report with acquisition data.
+
+    `query` is an Acquisition query, already filtered (filters_description is
+    printed under the header). Summary numbers come from report_summary();
+    the detail table lists the first PREVIEW_ROWS acquisitions, or all of them
+    with full_detail (streamed from the database page by page).
+    """
     
-    # Create temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    temp_file.close()
+    # Reserve the output file in the managed artifact store
+    file_path = artifact_store.new_path('.pdf', prefix='relatorio_')
     
     # Create document
     doc = SimpleDocTemplate(
-        temp_file.name,
+        file_path,
         pagesize=A4,
         rightMargin=72,
         leftMargin=72,
         topMargin=72,
-        bottomMargin=18
+        bottomMargin=18,
+        # Finished pages stay in memory until the file is saved; compression keeps them small
+        pageCompression=1
     )
     
     # Container for the 'Flowable' objects
@@ -71,18 +153,18 @@ def generate_report_pdf(acquisitions):
     story.append(Paragraph("SENAI Morvan Figueiredo", title_style))
     story.append(Paragraph("Sistema de Acompanhamento de Aquisições", header_style))
     story.append(Paragraph(f"Relatório Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}", header_style))
+    if filters_description:
+        story.append(Paragraph(f"Filtros: {escape(filters_description)}", header_style))
     story.append(Spacer(1, 20))
     
     # Summary Statistics
     story.append(Paragraph("Resumo Executivo", subtitle_style))
     
-    total_acquisitions = len(acquisitions)
-    servicos_count = len([a for a in acquisitions if a.type == AcquisitionType.SERVICO])
-    insumos_count = len([a for a in acquisitions if a.type == AcquisitionType.INSUMO])
-    
-    total_value = sum([a.final_value or 0 for a in acquisitions])
-    servicos_value = sum([a.final_value or 0 for a in acquisitions if a.type == AcquisitionType.SERVICO])
-    insumos_value = sum([a.final_value or 0 for a in acquisitions if a.type == AcquisitionType.INSUMO])
+    summary = report_summary(query)
+    servicos_count, servicos_value = summary.by_type[AcquisitionType.SERVICO]
+    insumos_count, insumos_value = summary.by_type[AcquisitionType.INSUMO]
+    total_acquisitions = summary.count
+    total_value = summary.value
     
     summary_data = [
         ['Indicador', 'Quantidade', 'Valor (R$)'],
@@ -111,13 +193,8 @@ def generate_report_pdf(acquisitions):
     # Status Distribution
     story.append(Paragraph("Distribuição por Status", subtitle_style))
     
-    status_counts = {}
-    for acquisition in acquisitions:
-        status = acquisition.status_display
-        status_counts[status] = status_counts.get(status, 0) + 1
-    
     status_data = [['Status', 'Quantidade', 'Percentual']]
-    for status, count in status_counts.items():
+    for status, count in summary.by_status:
         percentage = (count / total_acquisitions) * 100 if total_acquisitions > 0 else 0
         status_data.append([status, str(count), f'{percentage:.1f}%'])
     
@@ -136,29 +213,44 @@ def generate_report_pdf(acquisitions):
     ]))
     
     story.append(status_table)
+    story.append(Spacer(1, 30))
+    
+    # Cost Center Distribution
+    story.append(Paragraph("Distribuição por Centro de Custo", subtitle_style))
+    
+    cost_center_data = [['Centro de Custo', 'Quantidade', 'Valor (R$)']]
+    for name, count, value in summary.by_cost_center:
+        cost_center_data.append([_truncate(name, 40), str(count), f'R$ {value:,.2f}'])
+    
+    cost_center_table = Table(cost_center_data, colWidths=[2.5*inch, 1*inch, 1.5*inch], repeatRows=1)
+    cost_center_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e4a6b')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ]))
+    
+    story.append(cost_center_table)
+    story.append(PageBreak())
+    
+    # Charts
+    story.append(Paragraph("Gráficos", subtitle_style))
+    for title, chart in report_charts(summary):
+        story.append(Paragraph(title, styles['Heading3']))
+        story.append(chart)
+        story.append(Spacer(1, 20))
     story.append(PageBreak())
     
     # Detailed Acquisitions List
     story.append(Paragraph("Detalhamento das Solicitações", subtitle_style))
     
-    # Table headers
-    detailed_data = [
-        ['ID', 'Título', 'Tipo', 'Status', 'Solicitante', 'Valor', 'Data']
-    ]
-    
-    for acquisition in acquisitions[:50]:  # Limit to first 50 for readability
-        detailed_data.append([
-            str(acquisition.id),
-            acquisition.title[:30] + ('...' if len(acquisition.title) > 30 else ''),
-            acquisition.type_display,
-            acquisition.status_display,
-            acquisition.requester.full_name[:20] + ('...' if len(acquisition.requester.full_name) > 20 else ''),
-            f'R$ {acquisition.final_value:,.2f}' if acquisition.final_value else 'N/A',
-            acquisition.created_at.strftime('%d/%m/%Y')
-        ])
-    
-    detailed_table = Table(detailed_data, colWidths=[0.5*inch, 1.5*inch, 0.8*inch, 1*inch, 1*inch, 0.8*inch, 0.8*inch])
-    detailed_table.setStyle(TableStyle([
+    detail_style = TableStyle([
         ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e4a6b')),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
@@ -170,15 +262,24 @@ def generate_report_pdf(acquisitions):
         ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
         ('FONTSIZE', (0, 1), (-1, -1), 8),
         ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    
-    story.append(detailed_table)
+    ])
     
-    # Add note if more than 50 acquisitions
-    if len(acquisitions) > 50:
-        story.append(Spacer(1, 12))
-        story.append(Paragraph(f"<i>Mostrando as primeiras 50 solicitações de um total de {len(acquisitions)}.</i>", 
-                             styles['Normal']))
+    detail_query = query.order_by(None).order_by(Acquisition.id)
+    if full_detail:
+        rows = (_detail_cells(row) for row in report_rows(detail_query))
+        story.append(ChunkedTable(DETAIL_HEADER, rows, DETAIL_COL_WIDTHS, detail_style))
+    else:
+        detailed_data = [DETAIL_HEADER] + [_detail_cells(row) for row in report_rows(detail_query, limit=PREVIEW_ROWS)]
+        detailed_table = Table(detailed_data, colWidths=DETAIL_COL_WIDTHS, repeatRows=1)
+        detailed_table.setStyle(detail_style)
+        story.append(detailed_table)
+        
+        # Add note if there are more acquisitions than the preview shows
+        if total_acquisitions > PREVIEW_ROWS:
+            story.append(Spacer(1, 12))
+            story.append(Paragraph(f"<i>Mostrando as primeiras {PREVIEW_ROWS} solicitações de um total de "
+                                   f"{total_acquisitions}. Gere o PDF completo para a lista inteira.</i>",
+                                 styles['Normal']))
     
     # Footer
     story.append(Spacer(1, 30))
@@ -193,6 +294,11 @@ def generate_report_pdf(acquisitions):
                          footer_style))
     
     # Build PDF
-    doc.build(story)
+    try:
+        doc.build(story)
+    except Exception:
+        artifact_store.release(file_path)
+        raise
     
-    return temp_file.name
+    artifact_store.mark_complete(file_path)
+    return file_path
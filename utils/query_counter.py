@@ -0,0 +1,91 @@
+"""
+Per-request SQL statement counting, to catch N+1 query patterns.
+
+Enabled in debug and testing mode, or with QUERY_COUNTER=1. Every statement
+executed while a request is handled is counted; when the same SELECT (only
+its parameters changing) runs QUERY_COUNTER_N_PLUS_ONE times (default 5)
+or more in one request, it is logged as a possible N+1 lazy load. The total
+goes out in the X-Query-Count response header, and `count_queries()`
+counts the statements of any block of code (benchmarks, shell sessions).
+
+Statements run while a streamed response is being sent are not counted.
+"""
+
+import os
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+def _short(statement, length=300):
+    return ' '.join(statement.split())[:length]
+
+
+class QueryCounter:
+    def __init__(self, threshold=5, always=False):
+        self.threshold = threshold
+        self.always = always
+        # (endpoint, statement) -> number of requests where it looked like an N+1
+        self.suspects = Counter()
+
+    def init_app(self, app, engine):
+        event.listen(engine, 'before_cursor_execute', self._count)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def enabled(self):
+        # Checked per request: app.run(debug=True) sets debug after the app is configured
+        return self.always or current_app.debug or current_app.testing
+
+    def _start(self):
+        if self.enabled():
+            g.query_statements = Counter()
+
+    def _count(self, connection, cursor, statement, parameters, context, executemany):
+        # Background jobs run outside of requests and are not counted
+        if has_request_context() and 'query_statements' in g:
+            g.query_statements[statement] += 1
+
+    def _finish(self, response):
+        statements = g.pop('query_statements', None)
+        if statements is None:
+            return response
+
+        response.headers['X-Query-Count'] = str(sum(statements.values()))
+        for statement, count in statements.items():
+            if count >= self.threshold and statement.lstrip().upper().startswith('SELECT'):
+                self.suspects[(request.endpoint, _short(statement))] += 1
+                logging.warning(f"Possible N+1 query on {request.endpoint}: "
+                                f"{count} executions of {_short(statement)}")
+        return response
+
+    def stats(self):
+        return [
+            {'endpoint': endpoint, 'statement': statement, 'requests': requests}
+            for (endpoint, statement), requests in self.suspects.most_common()
+        ]
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect the statements executed on the engine inside the block"""
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+# Global instance
+query_counter = QueryCounter(
+    threshold=int(os.environ.get('QUERY_COUNTER_N_PLUS_ONE', '5')),
+    always=os.environ.get('QUERY_COUNTER') == '1'
+)
@@ -0,0 +1,207 @@
+"""
+Charts of the PDF report, drawn from the report_summary() aggregates.
+
+Each chart is built once per distinct data: drawings are cached in process
+under a hash of the aggregate rows they show, so repeated exports over
+unchanged data (or the same filters) reuse them, and any change in the
+numbers produces a new key. Cached drawings are expanded to plain shapes
+and only ever read, so concurrent exports can draw the same one.
+REPORT_CHART_CACHE_SIZE (default 64) bounds the number of drawings kept.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from reportlab.lib import colors
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.barcharts import VerticalBarChart, HorizontalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.platypus.flowables import Flowable
+
+from models import AcquisitionType, TYPE_LABELS
+
+CHART_WIDTH = 450
+CHART_HEIGHT = 250
+
+# Months shown in the monthly chart (the most recent ones)
+MONTHS_IN_CHART = 12
+
+# Cost centers shown in the cost center chart (the largest ones)
+COST_CENTERS_IN_CHART = 10
+
+PALETTE = [
+    colors.HexColor('#1e4a6b'), colors.HexColor('#e07b39'), colors.HexColor('#3c8d5a'),
+    colors.HexColor('#c0392b'), colors.HexColor('#8e6fb5'), colors.HexColor('#d4ac0d'),
+    colors.HexColor('#5d8aa8'), colors.HexColor('#7f8c8d'),
+]
+
+
+def _currency_axis(value):
+    return f'R$ {value / 1000:,.0f} mil' if value >= 1000 else f'R$ {value:,.0f}'
+
+
+def status_pie(by_status):
+    """Pie chart of report_summary().by_status"""
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    pie = Pie()
+    pie.x, pie.y = 40, 25
+    pie.width = pie.height = 200
+    pie.data = [count for label, count in by_status]
+    pie.sideLabels = False
+    pie.slices.strokeColor = colors.white
+    for index in range(len(by_status)):
+        pie.slices[index].fillColor = PALETTE[index % len(PALETTE)]
+    drawing.add(pie)
+
+    legend = Legend()
+    legend.x, legend.y = 280, CHART_HEIGHT - 30
+    legend.fontName = 'Helvetica'
+    legend.fontSize = 8
+    legend.alignment = 'right'
+    legend.columnMaximum = len(PALETTE)
+    legend.colorNamePairs = [
+        (PALETTE[index % len(PALETTE)], f'{label} ({count})') for index, (label, count) in enumerate(by_status)
+    ]
+    drawing.add(legend)
+    return drawing
+
+
+def monthly_bar(by_month):
+    """Bar chart of final values per month, one series per type, from report_summary().by_month"""
+    totals = {}
+    for year, month, acquisition_type, count, value in by_month:
+        totals.setdefault((year, month), {})[acquisition_type] = value
+    months = sorted(totals)[-MONTHS_IN_CHART:]
+    types = list(AcquisitionType)
+
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 70, 45
+    chart.width, chart.height = CHART_WIDTH - 90, CHART_HEIGHT - 70
+    chart.data = [[totals[month].get(acquisition_type, 0.0) for month in months] for acquisition_type in types]
+    chart.categoryAxis.categoryNames = [f'{month:02d}/{year % 100:02d}' for year, month in months]
+    chart.categoryAxis.labels.fontSize = 7
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.labelTextFormat = _currency_axis
+    chart.groupSpacing = 6
+    for index in range(len(types)):
+        chart.bars[index].fillColor = PALETTE[index]
+        chart.bars[index].strokeColor = None
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = 70, CHART_HEIGHT - 5
+    legend.fontName = 'Helvetica'
+    legend.fontSize = 8
+    legend.columnMaximum = 1
+    legend.deltax = 80
+    legend.colorNamePairs = [(PALETTE[index], TYPE_LABELS[acquisition_type])
+                             for index, acquisition_type in enumerate(types)]
+    drawing.add(legend)
+    return drawing
+
+
+def cost_center_bar(by_cost_center):
+    """Horizontal bar chart of final values per cost center, from report_summary().by_cost_center"""
+    rows = by_cost_center[:COST_CENTERS_IN_CHART]
+
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = HorizontalBarChart()
+    chart.x, chart.y = 130, 30
+    chart.width, chart.height = CHART_WIDTH - 150, CHART_HEIGHT - 45
+    # Largest at the top: the category axis is drawn bottom-up
+    chart.data = [[value for name, count, value in reversed(rows)]]
+    chart.categoryAxis.categoryNames = [name[:25] for name, count, value in reversed(rows)]
+    chart.categoryAxis.labels.fontSize = 8
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.labelTextFormat = _currency_axis
+    chart.bars[0].fillColor = PALETTE[0]
+    chart.bars[0].strokeColor = None
+    drawing.add(chart)
+    return drawing
+
+
+def _empty_chart():
+    drawing = Drawing(CHART_WIDTH, 40)
+    drawing.add(String(0, 15, 'Sem dados para o gráfico.', fontName='Helvetica-Oblique', fontSize=10))
+    return drawing
+
+
+class CachedDrawing(Flowable):
+    """Flowable drawing a shared, read-only Drawing"""
+
+    def __init__(self, drawing):
+        Flowable.__init__(self)
+        self.drawing = drawing
+
+    def wrap(self, avail_width, avail_height):
+        return self.drawing.width, self.drawing.height
+
+    def draw(self):
+        renderPDF.draw(self.drawing, self.canv, 0, 0)
+
+
+class ChartCache:
+    """LRU of expanded chart drawings keyed by chart name and a hash of its data"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(name, data):
+        return name + ':' + hashlib.sha1(repr(data).encode('utf-8')).hexdigest()
+
+    def get_or_build(self, name, build, data):
+        """The drawing for this data, built with build(data) on a miss"""
+        key = self.key(name, data)
+        with self._lock:
+            drawing = self._entries.get(key)
+            if drawing is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return drawing
+            self.misses += 1
+
+        # Charts compute their layout when drawn; expanding them once leaves plain shapes
+        drawing = (build(data) if data else _empty_chart()).expandUserNodes()
+        with self._lock:
+            self._entries[key] = drawing
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return drawing
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def report_charts(summary):
+    """[(title, flowable)] of the charts for a report_summary()"""
+    charts = [
+        ('Distribuição por Status', 'status_pie', status_pie, summary.by_status),
+        ('Valor Mensal por Tipo', 'monthly_bar', monthly_bar, summary.by_month),
+        ('Valor por Centro de Custo', 'cost_center_bar', cost_center_bar, summary.by_cost_center),
+    ]
+    return [(title, CachedDrawing(chart_cache.get_or_build(name, build, data)))
+            for title, name, build, data in charts]
+
+
+# Global instance
+chart_cache = ChartCache(max_entries=int(os.environ.get('REPORT_CHART_CACHE_SIZE', '64')))
@@ -0,0 +1,130 @@
+"""
+Report data computed in SQL.
+
+The report generators receive an Acquisition query (already filtered) and
+take their summary numbers from GROUP BY queries over it, so the summary
+costs the same whatever the number of rows. Detail rows are read as plain
+column tuples with yield_per and handed out as ReportRow namedtuples with
+their display labels already resolved, instead of ORM objects (see
+benchmarks/bench_report_rows.py).
+
+Summaries are computed for every export and never cached, so they always
+agree with the detail rows read next to them; the charts drawn from them
+are cached by utils/report_charts.py.
+"""
+
+from collections import namedtuple
+
+from sqlalchemy import cast, func
+
+from app import db
+from models import (Acquisition, AcquisitionType, AcquisitionStatus, Category, CostCenter, User,
+                    STATUS_LABELS, TYPE_LABELS, format_full_name)
+
+# Everything the summary sections of the PDF and Excel reports show
+ReportSummary = namedtuple('ReportSummary', 'count value by_type by_status by_cost_center by_month')
+
+# One acquisition as the detail sections and data exports show it
+ReportRow = namedtuple('ReportRow', 'id title type_label category status_label requester cost_center '
+                                    'estimated_value final_value created_at approved_at completed_at '
+                                    'justification budget_source payment_method updated_at')
+
+
+def _grouped(query, *columns):
+    return query.order_by(None).with_entities(*columns)
+
+
+def type_summary(query):
+    """{type: (count, sum of final values)}, with every type present"""
+    rows = _grouped(
+        query, Acquisition.type, func.count(Acquisition.id), func.coalesce(func.sum(Acquisition.final_value), 0)
+    ).group_by(Acquisition.type).all()
+
+    summary = {acquisition_type: (0, 0.0) for acquisition_type in AcquisitionType}
+    for acquisition_type, count, total in rows:
+        summary[acquisition_type] = (count, float(total))
+    return summary
+
+
+def status_summary(query):
+    """[(status label, count)] in workflow order, only statuses that occur"""
+    counts = dict(_grouped(query, Acquisition.status, func.count(Acquisition.id)).group_by(Acquisition.status).all())
+    return [(STATUS_LABELS[status], counts[status]) for status in AcquisitionStatus if counts.get(status)]
+
+
+def cost_center_summary(query):
+    """[(cost center name, count, sum of final values)], largest total first"""
+    total = func.coalesce(func.sum(Acquisition.final_value), 0)
+    rows = _grouped(query.join(CostCenter, Acquisition.cost_center_id == CostCenter.id),
+                    CostCenter.name, func.count(Acquisition.id), total
+                    ).group_by(CostCenter.id, CostCenter.name).order_by(total.desc(), CostCenter.name).all()
+    return [(name, count, float(value)) for name, count, value in rows]
+
+
+def monthly_summary(query):
+    """[(year, month, type, count, sum of final values)] in chronological order"""
+    year = cast(func.extract('year', Acquisition.created_at), db.Integer)
+    month = cast(func.extract('month', Acquisition.created_at), db.Integer)
+    rows = _grouped(
+        query.filter(Acquisition.created_at.isnot(None)),
+        year, month, Acquisition.type, func.count(Acquisition.id), func.coalesce(func.sum(Acquisition.final_value), 0)
+    ).group_by(year, month, Acquisition.type).order_by(year, month).all()
+    return [(year, month, acquisition_type, count, float(value)) for year, month, acquisition_type, count, value in rows]
+
+
+def report_summary(query):
+    """All summary numbers of a report, in four grouped queries"""
+    by_type = type_summary(query)
+    return ReportSummary(
+        count=sum(count for count, value in by_type.values()),
+        value=sum(value for count, value in by_type.values()),
+        by_type=by_type,
+        by_status=status_summary(query),
+        by_cost_center=cost_center_summary(query),
+        by_month=monthly_summary(query),
+    )
+
+
+def report_rows(query, limit=None, batch_size=1000):
+    """Yield a ReportRow per acquisition of the query, in the query's order.
+
+    Only the report columns are selected (with the category, cost center and
+    requester joined in the same query) and fetched in batches, so no ORM
+    objects are built; labels come from the module-level lookup tables.
+    """
+    rows = query.join(User, Acquisition.requester_id == User.id).outerjoin(
+        Category, Acquisition.category_id == Category.id
+    ).outerjoin(
+        CostCenter, Acquisition.cost_center_id == CostCenter.id
+    ).with_entities(
+        Acquisition.id, Acquisition.title, Acquisition.type, Category.name, Acquisition.status,
+        User.first_name, User.last_name, User.email, CostCenter.name,
+        Acquisition.estimated_value, Acquisition.final_value,
+        Acquisition.created_at, Acquisition.approved_at, Acquisition.completed_at,
+        Acquisition.justification, Acquisition.budget_source, Acquisition.payment_method,
+        Acquisition.updated_at
+    )
+    if limit is not None:
+        rows = rows.limit(limit)
+
+    for (acquisition_id, title, acquisition_type, category, status, first_name, last_name, email, cost_center,
+         estimated_value, final_value, created_at, approved_at, completed_at, justification, budget_source,
+         payment_method, updated_at) in rows.yield_per(batch_size):
+        yield ReportRow(
+            acquisition_id,
+            title,
+            TYPE_LABELS.get(acquisition_type, 'Insumo'),
+            category or '',
+            STATUS_LABELS.get(status, status.value if status else ''),
+            format_full_name(first_name, last_name, email),
+            cost_center or '',
+            float(estimated_value) if estimated_value is not None else 0,
+            float(final_value) if final_value is not None else 0,
+            created_at,
+            approved_at,
+            completed_at,
+            justification or '',
+            budget_source.value if budget_source else '',
+            payment_method.value if payment_method else '',
+            updated_at,
+        )
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from app import db
+from models import Acquisition, AcquisitionType, AcquisitionStatus, Category, CostCenter, User, STATUS_LABELS, TYPE_LABELS
+
+
+def parse_report_filters(args):
+    """Validate filter query parameters; raises ValueError with a user-facing message"""
+    filters = {}
+
+    try:
+        if args.get('date_from'):
+            filters['date_from'] = datetime.strptime(args['date_from'], '%Y-%m-%d')
+        if args.get('date_to'):
+            filters['date_to'] = datetime.strptime(args['date_to'], '%Y-%m-%d')
+    except ValueError:
+        raise ValueError('Datas devem estar no formato AAAA-MM-DD.')
+    if 'date_from' in filters and 'date_to' in filters and filters['date_from'] > filters['date_to']:
+        raise ValueError('A data inicial deve ser anterior à data final.')
+
+    try:
+        if args.get('type'):
+            filters['type'] = AcquisitionType(args['type'])
+        if args.get('status'):
+            filters['status'] = AcquisitionStatus(args['status'])
+    except ValueError:
+        raise ValueError('Tipo ou status inválido.')
+
+    if args.get('cost_center_id'):
+        try:
+            filters['cost_center_id'] = int(args['cost_center_id'])
+        except ValueError:
+            raise ValueError('Centro de custo inválido.')
+
+    if args.get('category_id'):
+        try:
+            filters['category_id'] = int(args['category_id'])
+        except ValueError:
+            raise ValueError('Categoria inválida.')
+
+    if args.get('requester_id'):
+        filters['requester_id'] = str(args['requester_id'])
+
+    if args.get('updated_since'):
+        try:
+            filters['updated_since'] = datetime.fromisoformat(args['updated_since'])
+        except ValueError:
+            raise ValueError('updated_since deve estar no formato ISO 8601 (ex.: 2025-08-01T00:00:00).')
+
+    return filters
+
+
+def apply_report_filters(query, filters):
+    """Push the filters down to (indexed) predicates on acquisitions"""
+    if 'date_from' in filters:
+        query = query.filter(Acquisition.created_at >= filters['date_from'])
+    if 'date_to' in filters:
+        # date_to is inclusive: everything before the next day
+        query = query.filter(Acquisition.created_at < filters['date_to'] + timedelta(days=1))
+    if 'type' in filters:
+        query = query.filter(Acquisition.type == filters['type'])
+    if 'status' in filters:
+        query = query.filter(Acquisition.status == filters['status'])
+    if 'cost_center_id' in filters:
+        query = query.filter(Acquisition.cost_center_id == filters['cost_center_id'])
+    if 'category_id' in filters:
+        query = query.filter(Acquisition.category_id == filters['category_id'])
+    if 'requester_id' in filters:
+        query = query.filter(Acquisition.requester_id == filters['requester_id'])
+    if 'updated_since' in filters:
+        query = query.filter(Acquisition.updated_at >= filters['updated_since'])
+    return query
+
+
+def report_filter_args(filters):
+    """Filters back as query-string values, for links and report job parameters"""
+    args = {}
+    for key, value in filters.items():
+        if key in ('date_from', 'date_to'):
+            args[key] = value.strftime('%Y-%m-%d')
+        elif key == 'updated_since':
+            args[key] = value.isoformat()
+        elif key in ('type', 'status'):
+            args[key] = value.value
+        else:
+            args[key] = str(value)
+    return args
+
+
+def describe_report_filters(filters):
+    """Human-readable summary of the filters, for report headers ('' without filters)"""
+    parts = []
+    if 'date_from' in filters or 'date_to' in filters:
+        date_from = filters['date_from'].strftime('%d/%m/%Y') if 'date_from' in filters else 'início'
+        date_to = filters['date_to'].strftime('%d/%m/%Y') if 'date_to' in filters else 'hoje'
+        parts.append(f'Período: {date_from} a {date_to}')
+    if 'type' in filters:
+        parts.append(f"Tipo: {TYPE_LABELS[filters['type']]}")
+    if 'status' in filters:
+        parts.append(f"Status: {STATUS_LABELS[filters['status']]}")
+    if 'cost_center_id' in filters:
+        cost_center = db.session.get(CostCenter, filters['cost_center_id'])
+        parts.append(f"Centro de custo: {cost_center.name if cost_center else filters['cost_center_id']}")
+    if 'category_id' in filters:
+        category = db.session.get(Category, filters['category_id'])
+        parts.append(f"Categoria: {category.name if category else filters['category_id']}")
+    if 'requester_id' in filters:
+        requester = db.session.get(User, filters['requester_id'])
+        parts.append(f"Solicitante: {requester.full_name if requester else filters['requester_id']}")
+    if 'updated_since' in filters:
+        parts.append(f"Alteradas desde: {filters['updated_since'].strftime('%d/%m/%Y %H:%M')}")
+    return ' · '.join(parts)
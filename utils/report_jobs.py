@@ -0,0 +1,200 @@
+"""
+Background generation of PDF/Excel reports.
+
+A request submits a job and gets its id back immediately; the report is
+built on a local thread pool (REPORT_JOB_WORKERS, default 2) and the
+client polls the job status until the artifact can be downloaded. Jobs
+carry the report filters as params (query-string values, see
+utils/report_filters.py).
+
+Job state lives in the report_jobs table so any gunicorn worker can
+answer status and download requests. Identical requests that are still
+pending or running share one job, and finished jobs are removed together
+with their files after REPORT_JOB_RETENTION_HOURS (default 24). A job
+still in flight after STALE_AFTER lost its worker (restart, reload,
+scale-down) and is marked failed, so a new request starts a fresh one.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import app, db
+from models import Acquisition, ReportJob
+from utils.pdf_generator import generate_report_pdf
+from utils.excel_generator import write_excel_report_streaming
+from utils.artifact_store import artifact_store
+from utils.report_filters import parse_report_filters, apply_report_filters, describe_report_filters
+
+IN_FLIGHT_STATUSES = ('pending', 'running')
+
+# A job still pending or running this long after it was queued or started lost its worker
+STALE_AFTER = timedelta(minutes=15)
+
+
+def _in_flight_since():
+    """When an in-flight job last made progress: started, or queued if not started yet"""
+    return func.coalesce(ReportJob.started_at, ReportJob.created_at)
+
+
+def _filtered(params):
+    """The filtered acquisition query and its description, from the job's filter parameters"""
+    filters = parse_report_filters(params)
+    return apply_report_filters(Acquisition.query, filters), describe_report_filters(filters)
+
+
+def build_pdf_report(params):
+    query, description = _filtered(params)
+    return generate_report_pdf(query, filters_description=description)
+
+
+def build_full_pdf_report(params):
+    query, description = _filtered(params)
+    return generate_report_pdf(query, full_detail=True, filters_description=description)
+
+
+def build_excel_report(params):
+    query, description = _filtered(params)
+    file_path = artifact_store.new_path('.xlsx', prefix='relatorio_')
+    try:
+        write_excel_report_streaming(query.order_by(Acquisition.id), file_path, filters_description=description)
+    except Exception:
+        artifact_store.release(file_path)
+        raise
+    artifact_store.mark_complete(file_path)
+    return file_path
+
+
+REPORT_BUILDERS = {
+    'pdf': (build_pdf_report, 'relatorio_aquisicoes.pdf'),
+    'pdf_full': (build_full_pdf_report, 'relatorio_aquisicoes_completo.pdf'),
+    'excel': (build_excel_report, 'relatorio_aquisicoes.xlsx'),
+}
+
+
+class ReportJobQueue:
+    """Submits report jobs to a local thread pool and tracks them in the database"""
+
+    def __init__(self, max_workers=2, retention=timedelta(hours=24)):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self.retention = retention
+
+    def submit(self, kind, params, user_id):
+        """Return the in-flight job for an identical request, or start a new one"""
+        if kind not in REPORT_BUILDERS:
+            raise ValueError(f"Tipo de relatório inválido: {kind}")
+
+        self.cleanup()
+
+        params_json = json.dumps(params or {}, sort_keys=True)
+        # Filtered jobs can have long parameters; hashing keeps distinct requests distinct within 200 chars
+        dedup_key = f"{kind}:{hashlib.sha1(params_json.encode('utf-8')).hexdigest()}"
+
+        existing = ReportJob.query.filter(
+            ReportJob.dedup_key == dedup_key,
+            ReportJob.status.in_(IN_FLIGHT_STATUSES),
+            _in_flight_since() >= datetime.now() - STALE_AFTER
+        ).first()
+        if existing:
+            return existing
+
+        job = ReportJob(kind=kind, params=params_json, dedup_key=dedup_key,
+                        status='pending', requested_by_id=user_id)
+        db.session.add(job)
+        db.session.commit()
+
+        self.executor.submit(self._run, job.id)
+        return job
+
+    def _run(self, job_id):
+        with app.app_context():
+            job = db.session.get(ReportJob, job_id)
+            if job is None:
+                return
+
+            job.status = 'running'
+            job.started_at = datetime.now()
+            db.session.commit()
+
+            builder, filename = REPORT_BUILDERS[job.kind]
+            try:
+                file_path = builder(json.loads(job.params or '{}'))
+                # Kept until the job expires, whichever worker serves the download
+                artifact_store.pin(file_path)
+                job.status = 'done'
+                job.file_path = file_path
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Report job {job_id} failed: {e}")
+                job = db.session.get(ReportJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+
+            job.finished_at = datetime.now()
+            db.session.commit()
+            db.session.remove()
+
+    def is_stale(self, job):
+        if job.status not in IN_FLIGHT_STATUSES:
+            return False
+        return (job.started_at or job.created_at) < datetime.now() - STALE_AFTER
+
+    def fail_if_stale(self, job):
+        """Mark a job whose worker was lost as failed, so pollers stop waiting for it"""
+        if self.is_stale(job):
+            self._fail_stale(job)
+            db.session.commit()
+        return job
+
+    @staticmethod
+    def _fail_stale(job):
+        job.status = 'failed'
+        job.error = 'Geração interrompida'
+        job.finished_at = datetime.now()
+
+    def cleanup(self):
+        """Fail jobs that lost their worker; delete finished jobs older than the retention period with their files"""
+        cutoff = datetime.now() - self.retention
+
+        stale = ReportJob.query.filter(
+            ReportJob.status.in_(IN_FLIGHT_STATUSES),
+            _in_flight_since() < datetime.now() - STALE_AFTER
+        ).all()
+        for job in stale:
+            self._fail_stale(job)
+
+        expired = ReportJob.query.filter(
+            ReportJob.status.notin_(IN_FLIGHT_STATUSES),
+            ReportJob.finished_at < cutoff
+        ).all()
+
+        for job in expired:
+            if job.file_path:
+                artifact_store.release(job.file_path)
+            db.session.delete(job)
+
+        if stale or expired:
+            db.session.commit()
+
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# Global instance
+report_jobs = ReportJobQueue(
+    max_workers=int(os.environ.get('REPORT_JOB_WORKERS', '2')),
+    retention=timedelta(hours=float(os.environ.get('REPORT_JOB_RETENTION_HOURS', '24')))
+)
@@ -0,0 +1,175 @@
+"""
+Per-request profiling: response time and SQL statements of every request.
+
+For each request the profiler records the endpoint, total time, number of
+SQL statements, total SQL time and the slowest statements, and writes them
+as one JSON line to the "request_profile" logger (WARNING for requests
+slower than REQUEST_SLOW_MS, INFO otherwise). The last
+REQUEST_PROFILE_WINDOW_MINUTES (default 15) of samples are kept in memory
+for /admin/performance: p50/p95/p99 per endpoint and the slowest queries.
+
+Samples are per process, so with several gunicorn workers the page shows
+the worker that served it. Time spent sending a streamed response is not
+included. Set REQUEST_PROFILING=0 to turn it off.
+"""
+
+import os
+import re
+import json
+import time
+import heapq
+import logging
+import threading
+from collections import deque, defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+profile_log = logging.getLogger('request_profile')
+
+# "IN (?, ?, ?)" lists of any length count as the same statement
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+|\$\d+)\s*,?)+\)')
+
+
+def normalize_statement(statement, length=500):
+    return PLACEHOLDER_LIST.sub('(...)', ' '.join(statement.split()))[:length]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class RequestProfiler:
+    def __init__(self, window_seconds=900, max_samples=20000, slow_statements=3, slow_request_ms=1000):
+        self.window_seconds = window_seconds
+        self.slow_statements = slow_statements
+        self.slow_request_ms = slow_request_ms
+        self._samples = deque(maxlen=max_samples)  # (time, endpoint, total_ms, sql_count, sql_ms)
+        self._statements = deque(maxlen=max_samples)  # (time, endpoint, duration_ms, statement)
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_statement)
+        event.listen(engine, 'after_cursor_execute', self._after_statement)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g.request_profile = {'start': time.perf_counter(), 'sql_count': 0, 'sql_ms': 0.0, 'slowest': []}
+
+    def _before_statement(self, connection, cursor, statement, parameters, context, executemany):
+        if context is not None and has_request_context() and 'request_profile' in g:
+            context.profile_start = time.perf_counter()
+
+    def _after_statement(self, connection, cursor, statement, parameters, context, executemany):
+        start = getattr(context, 'profile_start', None)
+        if start is None or not has_request_context() or 'request_profile' not in g:
+            return
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        profile = g.request_profile
+        profile['sql_count'] += 1
+        profile['sql_ms'] += duration_ms
+        # Min-heap of the slowest statements of this request
+        entry = (duration_ms, profile['sql_count'], statement)
+        if len(profile['slowest']) < self.slow_statements:
+            heapq.heappush(profile['slowest'], entry)
+        elif duration_ms > profile['slowest'][0][0]:
+            heapq.heapreplace(profile['slowest'], entry)
+
+    def _finish(self, response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+
+        now = time.time()
+        endpoint = request.endpoint or request.path
+        total_ms = (time.perf_counter() - profile['start']) * 1000
+        slowest = sorted(profile['slowest'], reverse=True)
+
+        with self._lock:
+            self._samples.append((now, endpoint, total_ms, profile['sql_count'], profile['sql_ms']))
+            for duration_ms, order, statement in slowest:
+                self._statements.append((now, endpoint, duration_ms, normalize_statement(statement)))
+
+        record = {
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'sql_count': profile['sql_count'],
+            'sql_ms': round(profile['sql_ms'], 1),
+            'slowest': [
+                {'ms': round(duration_ms, 1), 'sql': normalize_statement(statement, 200)}
+                for duration_ms, order, statement in slowest
+            ],
+        }
+        level = logging.WARNING if total_ms >= self.slow_request_ms else logging.INFO
+        profile_log.log(level, json.dumps(record, ensure_ascii=False))
+        return response
+
+    def _window(self):
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            while self._statements and self._statements[0][0] < cutoff:
+                self._statements.popleft()
+            return list(self._samples), list(self._statements)
+
+    def stats(self, top=20):
+        """Per-endpoint latency percentiles and the slowest statements over the window"""
+        samples, statements = self._window()
+
+        by_endpoint = defaultdict(list)
+        for sampled_at, endpoint, total_ms, sql_count, sql_ms in samples:
+            by_endpoint[endpoint].append((total_ms, sql_count, sql_ms))
+
+        endpoints = []
+        for endpoint, rows in by_endpoint.items():
+            durations = sorted(row[0] for row in rows)
+            endpoints.append({
+                'endpoint': endpoint,
+                'requests': len(rows),
+                'p50_ms': round(percentile(durations, 0.50), 1),
+                'p95_ms': round(percentile(durations, 0.95), 1),
+                'p99_ms': round(percentile(durations, 0.99), 1),
+                'max_ms': round(durations[-1], 1),
+                'avg_sql_count': round(sum(row[1] for row in rows) / len(rows), 1),
+                'avg_sql_ms': round(sum(row[2] for row in rows) / len(rows), 1),
+            })
+        endpoints.sort(key=lambda row: row['p95_ms'], reverse=True)
+
+        by_statement = {}
+        for sampled_at, endpoint, duration_ms, statement in statements:
+            entry = by_statement.setdefault(statement, {'statement': statement, 'count': 0, 'max_ms': 0.0,
+                                                        'total_ms': 0.0, 'endpoints': set()})
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['endpoints'].add(endpoint)
+
+        slow_queries = sorted(by_statement.values(), key=lambda entry: entry['max_ms'], reverse=True)[:top]
+        for entry in slow_queries:
+            entry['avg_ms'] = round(entry.pop('total_ms') / entry['count'], 1)
+            entry['max_ms'] = round(entry['max_ms'], 1)
+            entry['endpoints'] = sorted(entry['endpoints'])
+
+        return {
+            'window_minutes': round(self.window_seconds / 60),
+            'requests': len(samples),
+            'endpoints': endpoints,
+            'slow_queries': slow_queries,
+        }
+
+
+# Global instance
+request_profiler = RequestProfiler(
+    window_seconds=float(os.environ.get('REQUEST_PROFILE_WINDOW_MINUTES', '15')) * 60,
+    slow_request_ms=float(os.environ.get('REQUEST_SLOW_MS', '1000'))
+)
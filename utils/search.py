@@ -0,0 +1,140 @@
+"""
+Full-text search over acquisitions (title, description, justification,
+budget_provider).
+
+PostgreSQL: GIN index on a weighted tsvector with Portuguese stemming,
+queried with websearch_to_tsquery and ranked with ts_rank.
+SQLite (local runs): external-content FTS5 table kept in sync by triggers,
+ranked with bm25. Without FTS5 support the search falls back to LIKE.
+"""
+
+import re
+import logging
+from sqlalchemy import func, literal_column, select, table, text, or_
+
+from app import db
+from models import Acquisition
+
+# Rendered inline (not as a bound parameter) so the query expression matches the index
+SEARCH_CONFIG = literal_column("'portuguese'::regconfig")
+
+FTS5_TABLE = 'acquisitions_fts'
+
+FTS5_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS5_TABLE} USING fts5(
+        title, description, justification, budget_provider,
+        content='acquisitions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS acquisitions_fts_insert AFTER INSERT ON acquisitions BEGIN
+        INSERT INTO {FTS5_TABLE}(rowid, title, description, justification, budget_provider)
+        VALUES (new.id, new.title, new.description, new.justification, new.budget_provider);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS acquisitions_fts_delete AFTER DELETE ON acquisitions BEGIN
+        INSERT INTO {FTS5_TABLE}({FTS5_TABLE}, rowid, title, description, justification, budget_provider)
+        VALUES ('delete', old.id, old.title, old.description, old.justification, old.budget_provider);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS acquisitions_fts_update AFTER UPDATE ON acquisitions BEGIN
+        INSERT INTO {FTS5_TABLE}({FTS5_TABLE}, rowid, title, description, justification, budget_provider)
+        VALUES ('delete', old.id, old.title, old.description, old.justification, old.budget_provider);
+        INSERT INTO {FTS5_TABLE}(rowid, title, description, justification, budget_provider)
+        VALUES (new.id, new.title, new.description, new.justification, new.budget_provider);
+    END""",
+    f"INSERT INTO {FTS5_TABLE}({FTS5_TABLE}) VALUES ('rebuild')",
+]
+
+
+def search_vector():
+    """Weighted tsvector expression; must match the GIN index definition exactly"""
+    columns = Acquisition.__table__.c
+
+    def weighted(column, weight):
+        return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(column, '')), weight)
+
+    return (
+        weighted(columns.title, 'A')
+        .op('||')(weighted(columns.description, 'B'))
+        .op('||')(weighted(columns.justification, 'C'))
+        .op('||')(weighted(columns.budget_provider, 'C'))
+    )
+
+
+def create_search_index(connection):
+    """Create the dialect-specific full-text index"""
+    dialect = connection.dialect.name
+
+    if dialect == 'postgresql':
+        expression = search_vector().compile(
+            dialect=connection.dialect,
+            compile_kwargs={'literal_binds': True, 'include_table': False}
+        )
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_acquisitions_search ON acquisitions USING GIN (({expression}))"
+        ))
+    elif dialect == 'sqlite':
+        if not fts5_available(connection):
+            logging.warning("SQLite FTS5 not available, search will fall back to LIKE")
+            return
+        for statement in FTS5_SETUP:
+            connection.execute(text(statement))
+
+
+def fts5_available(connection):
+    try:
+        options = connection.execute(text("PRAGMA compile_options")).scalars().all()
+    except Exception:
+        return False
+    return 'ENABLE_FTS5' in options
+
+
+def _fts5_table_exists():
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS5_TABLE}
+    ).first() is not None
+
+
+def _fts5_match_expression(terms):
+    # Quote every term so user input can't inject FTS5 query syntax; prefix match
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def apply_search(query, search_text):
+    """Restrict an Acquisition query to matches of search_text, best matches first"""
+    terms = re.findall(r'\w+', search_text or '')
+    if not terms:
+        return query
+
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, search_text)
+        vector = search_vector()
+        return query.filter(vector.op('@@')(ts_query)).order_by(
+            func.ts_rank(vector, ts_query).desc(),
+            Acquisition.created_at.desc()
+        )
+
+    if dialect == 'sqlite' and _fts5_table_exists():
+        fts = table(FTS5_TABLE)
+        matches = select(
+            literal_column('rowid').label('acquisition_id'),
+            literal_column(f'bm25({FTS5_TABLE})').label('rank')
+        ).select_from(fts).where(
+            literal_column(FTS5_TABLE).op('MATCH')(_fts5_match_expression(terms))
+        ).subquery()
+        return query.join(matches, matches.c.acquisition_id == Acquisition.id).order_by(
+            matches.c.rank,
+            Acquisition.created_at.desc()
+        )
+
+    # No full-text support: every term must appear in one of the columns
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(or_(
+            Acquisition.title.ilike(pattern),
+            Acquisition.description.ilike(pattern),
+            Acquisition.justification.ilike(pattern),
+            Acquisition.budget_provider.ilike(pattern)
+        ))
+    return query.order_by(Acquisition.created_at.desc())
@@ -0,0 +1,200 @@
+"""
+Monthly spending rollup (year, month, type, cost center).
+
+Every code path that creates an acquisition or changes its values must
+report it here so the monthly_spending table stays in sync:
+
+    snapshot = rollup_snapshot(acquisition)   # before changing values
+    ...
+    record_changed(snapshot, acquisition)     # after, before commit
+
+`flask rebuild-spending-rollup` recomputes the whole table from
+acquisitions for backfills or after manual data fixes.
+"""
+
+import logging
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import func, cast, insert, delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models import Acquisition, CostCenter, MonthlySpending
+
+
+def _decimal(value):
+    if value is None:
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def rollup_snapshot(acquisition):
+    """Capture the rollup contribution of an acquisition before it changes"""
+    key = (acquisition.created_at.year, acquisition.created_at.month,
+           acquisition.type, acquisition.cost_center_id)
+    return key, _decimal(acquisition.final_value), _decimal(acquisition.estimated_value)
+
+
+def _dialect_insert():
+    """INSERT construct with ON CONFLICT support for the current database, or None"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def apply_rollup_delta(key, count=0, sum_final=0, sum_estimated=0):
+    """Add the given deltas to one rollup row, creating it if needed.
+
+    A single upsert, so concurrent first writes to the same key add up
+    instead of one of them failing on the unique constraint.
+    """
+    if not count and not sum_final and not sum_estimated:
+        return
+
+    year, month, acquisition_type, cost_center_id = key
+    values = {
+        'year': year,
+        'month': month,
+        'type': acquisition_type,
+        'cost_center_id': cost_center_id,
+        'count': count,
+        'sum_final': _decimal(sum_final),
+        'sum_estimated': _decimal(sum_estimated),
+        'updated_at': datetime.now(),
+    }
+    table = MonthlySpending.__table__
+
+    dialect_insert = _dialect_insert()
+    if dialect_insert is not None:
+        statement = dialect_insert(table).values(**values)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['year', 'month', 'type', 'cost_center_id'],
+            set_={
+                'count': table.c.count + statement.excluded.count,
+                'sum_final': table.c.sum_final + statement.excluded.sum_final,
+                'sum_estimated': table.c.sum_estimated + statement.excluded.sum_estimated,
+                'updated_at': statement.excluded.updated_at,
+            }
+        ))
+        return
+
+    # Other databases: add to the row, or insert it in a savepoint and add again if another
+    # transaction created it in the meantime
+    increment = update(table).where(
+        table.c.year == year,
+        table.c.month == month,
+        table.c.type == acquisition_type,
+        table.c.cost_center_id == cost_center_id
+    ).values(
+        count=table.c.count + count,
+        sum_final=table.c.sum_final + values['sum_final'],
+        sum_estimated=table.c.sum_estimated + values['sum_estimated'],
+        updated_at=values['updated_at']
+    )
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(**values))
+    except IntegrityError:
+        db.session.execute(increment)
+
+
+def record_created(acquisitions):
+    """Add newly created (already flushed) acquisitions to the rollup"""
+    deltas = {}
+    for acquisition in acquisitions:
+        key, final_value, estimated_value = rollup_snapshot(acquisition)
+        count, sum_final, sum_estimated = deltas.get(key, (0, Decimal('0'), Decimal('0')))
+        deltas[key] = (count + 1, sum_final + final_value, sum_estimated + estimated_value)
+
+    for key, (count, sum_final, sum_estimated) in deltas.items():
+        apply_rollup_delta(key, count, sum_final, sum_estimated)
+
+
+def record_changed(snapshot, acquisition):
+    """Move an acquisition's contribution from its old snapshot to its current values"""
+    old_key, old_final, old_estimated = snapshot
+    new_key, new_final, new_estimated = rollup_snapshot(acquisition)
+
+    if old_key == new_key:
+        apply_rollup_delta(new_key, 0, new_final - old_final, new_estimated - old_estimated)
+    else:
+        apply_rollup_delta(old_key, -1, -old_final, -old_estimated)
+        apply_rollup_delta(new_key, 1, new_final, new_estimated)
+
+
+def rebuild_rollup(connection):
+    """Recompute the whole rollup table from the acquisitions table"""
+    year = cast(func.extract('year', Acquisition.created_at), db.Integer)
+    month = cast(func.extract('month', Acquisition.created_at), db.Integer)
+
+    aggregates = select(
+        year,
+        month,
+        Acquisition.type,
+        Acquisition.cost_center_id,
+        func.count(Acquisition.id),
+        func.coalesce(func.sum(Acquisition.final_value), 0),
+        func.coalesce(func.sum(Acquisition.estimated_value), 0),
+        func.now()
+    ).where(
+        Acquisition.created_at.isnot(None)
+    ).group_by(year, month, Acquisition.type, Acquisition.cost_center_id)
+
+    table = MonthlySpending.__table__
+    connection.execute(delete(table))
+    connection.execute(insert(table).from_select(
+        ['year', 'month', 'type', 'cost_center_id', 'count', 'sum_final', 'sum_estimated', 'updated_at'],
+        aggregates
+    ))
+
+
+@app.cli.command('rebuild-spending-rollup')
+def rebuild_spending_rollup_command():
+    """Recompute the monthly spending rollup from scratch"""
+    with db.engine.begin() as connection:
+        rebuild_rollup(connection)
+    rows = MonthlySpending.query.count()
+    logging.info(f"Spending rollup rebuilt with {rows} rows")
+    print(f"Rollup reconstruído: {rows} linhas")
+
+
+def monthly_totals(year):
+    """(month, type, total, count) rows for the given year"""
+    return db.session.query(
+        MonthlySpending.month,
+        MonthlySpending.type,
+        func.sum(MonthlySpending.sum_final).label('total'),
+        func.sum(MonthlySpending.count).label('count')
+    ).filter(
+        MonthlySpending.year == year
+    ).group_by(
+        MonthlySpending.month,
+        MonthlySpending.type
+    ).order_by(MonthlySpending.month).all()
+
+
+def type_totals():
+    """Total final value per acquisition type"""
+    rows = db.session.query(
+        MonthlySpending.type,
+        func.sum(MonthlySpending.sum_final)
+    ).group_by(MonthlySpending.type).all()
+    return {acquisition_type: total or 0 for acquisition_type, total in rows}
+
+
+def cost_center_totals():
+    """(name, total, count) rows per cost center"""
+    return db.session.query(
+        CostCenter.name,
+        func.sum(MonthlySpending.sum_final).label('total'),
+        func.sum(MonthlySpending.count).label('count')
+    ).join(MonthlySpending.cost_center).group_by(CostCenter.name).all()
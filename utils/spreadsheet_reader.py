@@ -0,0 +1,216 @@
+"""
+Streaming readers for import files (.xlsx, .xls and CSV).
+
+.xlsx rows are read lazily with openpyxl's read-only mode and CSV files
+with the csv module (encoding and delimiter are detected from the first
+block), so memory stays flat regardless of the file size and the preview
+only touches the first rows. Legacy .xls files fall back to pandas.
+
+inspect_spreadsheet() turns a mapping (see utils/import_mappings.py) into
+an import plan: the file format and, for every sheet to import, the column
+position of each field and the estimated row count. The plan is kept in the
+session and on the ImportRun, so the import streams the rows once without
+looking for headers or counting rows again.
+"""
+
+import csv
+import re
+import zipfile
+from contextlib import contextmanager
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.import_mappings import IMPORT_FIELDS, resolve_columns
+
+RECORD_COLUMNS = list(IMPORT_FIELDS) + ['sheet', 'line']
+
+ROW_NUMBER = re.compile(rb'<(?:\w+:)?row [^>]*?r="(\d+)"')
+
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0'
+
+CSV_SAMPLE_SIZE = 64 * 1024
+
+
+def detect_format(file_path):
+    if zipfile.is_zipfile(file_path):
+        return 'xlsx'
+    with open(file_path, 'rb') as f:
+        if f.read(len(XLS_SIGNATURE)) == XLS_SIGNATURE:
+            return 'xls'
+    return 'csv'
+
+
+def detect_csv_dialect(file_path):
+    """(encoding, delimiter) of a CSV file, from its first block"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(CSV_SAMPLE_SIZE)
+
+    try:
+        text = sample.decode('utf-8-sig')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut at the end of the sample is still UTF-8
+        if e.start >= len(sample) - 3:
+            text = sample[:e.start].decode('utf-8-sig')
+            encoding = 'utf-8-sig'
+        else:
+            text = sample.decode('cp1252', errors='replace')
+            encoding = 'cp1252'
+
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=';,\t|').delimiter
+    except csv.Error:
+        delimiter = ';' if text.count(';') > text.count(',') else ','
+    return encoding, delimiter
+
+
+@contextmanager
+def open_workbook(file_path):
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield workbook
+    finally:
+        workbook.close()
+
+
+def _last_row_number(file_path, worksheet):
+    """Number of the last row in the sheet XML, for files written without a dimension"""
+    sheet_path = getattr(worksheet, '_worksheet_path', None)
+    if not sheet_path:
+        return None
+
+    last_row = None
+    tail = b''
+    with zipfile.ZipFile(file_path) as archive, archive.open(sheet_path) as xml:
+        while True:
+            block = xml.read(1024 * 1024)
+            if not block:
+                break
+            matches = ROW_NUMBER.findall(tail + block)
+            if matches:
+                last_row = int(matches[-1])
+            tail = block[-256:]
+    return last_row
+
+
+def _selected_sheets(names, sheets):
+    if sheets == 'first':
+        return names[:1]
+    if sheets == 'all':
+        return names
+    return [name for name in names if name in sheets]
+
+
+def _iter_xls_rows(file_path, sheet, min_row, nrows=None):
+    df = pd.read_excel(file_path, sheet_name=sheet, header=None, skiprows=min_row - 1, nrows=nrows)
+    for line, values in enumerate(df.itertuples(index=False, name=None), start=min_row):
+        yield line, tuple(None if pd.isna(value) else value for value in values)
+
+
+def _iter_csv_rows(file_path, encoding, delimiter, min_row=1):
+    with open(file_path, encoding=encoding, errors='replace', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        for values in reader:
+            if reader.line_num >= min_row:
+                yield reader.line_num, tuple(value if value.strip() else None for value in values)
+
+
+def _iter_sheet_rows(file_path, plan, sheet, min_row):
+    """(line, values) rows of one sheet of the planned file, from min_row (1-based)"""
+    if plan['format'] == 'csv':
+        yield from _iter_csv_rows(file_path, plan['encoding'], plan['delimiter'], min_row)
+    elif plan['format'] == 'xls':
+        yield from _iter_xls_rows(file_path, sheet, min_row)
+    else:
+        with open_workbook(file_path) as workbook:
+            worksheet = workbook[sheet]
+            yield from enumerate(worksheet.iter_rows(min_row=min_row, values_only=True), start=min_row)
+
+
+def _records(rows, sheet, columns, required):
+    """Turn (line, values) rows into dicts of the mapped fields, skipping incomplete rows"""
+    for line, values in rows:
+        record = {
+            field: values[position] if position < len(values) else None
+            for field, position in columns.items()
+        }
+        if any(record.get(field) is None or str(record[field]).strip() == '' for field in required):
+            continue
+        record['sheet'] = sheet
+        record['line'] = line
+        yield record
+
+
+def inspect_spreadsheet(file_path, mapping, limit=10):
+    """Build the import plan for a file and read its first `limit` records; returns (plan, records)"""
+    plan = {
+        'format': detect_format(file_path),
+        'header_row': mapping['header_row'],
+        'required': mapping['required'],
+        'defaults': mapping['defaults'],
+        'sheets': [],
+        'skipped_sheets': [],
+    }
+    header_line = mapping['header_row'] + 1
+    records = []
+
+    def add_sheet(name, header, rows, last_row):
+        columns = resolve_columns(mapping['columns'], header)
+        missing = [field for field in mapping['required'] if field not in columns]
+        if missing:
+            plan['skipped_sheets'].append({'name': name, 'missing': missing})
+            return
+        plan['sheets'].append({
+            'name': name,
+            'columns': columns,
+            # Includes blank rows, which are skipped by the import
+            'estimated_rows': max(last_row - header_line, 0) if last_row else None,
+        })
+        records.extend(islice(_records(rows, name, columns, mapping['required']), limit - len(records)))
+
+    if plan['format'] == 'csv':
+        plan['encoding'], plan['delimiter'] = detect_csv_dialect(file_path)
+        rows = _iter_csv_rows(file_path, plan['encoding'], plan['delimiter'], header_line)
+        header = next(rows, (None, ()))[1]
+        add_sheet(None, header, rows, None)
+
+    elif plan['format'] == 'xls':
+        names = pd.ExcelFile(file_path).sheet_names
+        for name in _selected_sheets(names, mapping['sheets']):
+            # Enough rows for the preview, unless most of them are blank
+            rows = _iter_xls_rows(file_path, name, header_line, nrows=limit * 10 + 1)
+            header = next(rows, (None, ()))[1]
+            add_sheet(name, header, rows, None)
+
+    else:
+        with open_workbook(file_path) as workbook:
+            for name in _selected_sheets(workbook.sheetnames, mapping['sheets']):
+                worksheet = workbook[name]
+                rows = enumerate(worksheet.iter_rows(min_row=header_line, values_only=True), start=header_line)
+                header = next(rows, (None, ()))[1]
+                last_row = worksheet.max_row or _last_row_number(file_path, worksheet)
+                add_sheet(name, header, rows, last_row)
+
+    estimates = [sheet['estimated_rows'] for sheet in plan['sheets']]
+    plan['estimated_rows'] = sum(estimates) if estimates and None not in estimates else None
+    return plan, records
+
+
+def iter_records(file_path, plan):
+    """Yield a dict per data row of every planned sheet (mapped fields, sheet and line)"""
+    start = plan['header_row'] + 2
+    for sheet in plan['sheets']:
+        rows = _iter_sheet_rows(file_path, plan, sheet['name'], start)
+        yield from _records(rows, sheet['name'], sheet['columns'], plan['required'])
+
+
+def iter_chunks(file_path, plan, chunk_size, start_row=0):
+    """Yield DataFrames of chunk_size records, skipping the first start_row records"""
+    records = islice(iter_records(file_path, plan), start_row, None)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield pd.DataFrame(chunk, columns=RECORD_COLUMNS)
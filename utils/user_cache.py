@@ -0,0 +1,95 @@
+"""
+Per-process cache of the users loaded by Flask-Login.
+
+Flask-Login loads the logged-in user on every request. The cache keeps a
+detached copy of each user's row for USER_CACHE_TTL seconds (default 30)
+and merges it into the request's session with load=False, so a cached
+user costs no query; relationships are still lazy-loaded on access.
+
+Every write path that changes a user (role, approval, deactivation,
+notification preference) calls `user_cache.invalidate(user_id)`. That
+only reaches the current process; other gunicorn workers see the change
+when their entry expires, so the TTL bounds how long a deactivated user
+keeps access there.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db
+from models import User
+
+
+class UserCache:
+    def __init__(self, ttl=30, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def load(self, user_id):
+        """The user with this id attached to the current session, or None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[user_id]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is not None:
+            return db.session.merge(entry[0], load=False)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self._store(user)
+        return user
+
+    def _store(self, user):
+        # A copy that is never attached to a session, so requests can merge it concurrently
+        snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+        make_transient_to_detached(snapshot)
+
+        with self._lock:
+            self._entries[user.id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop a user whose row changed; the next request reloads it"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+# Global instance
+user_cache = UserCache(
+    ttl=float(os.environ.get('USER_CACHE_TTL', '30')),
+    max_entries=int(os.environ.get('USER_CACHE_MAX_ENTRIES', '1024'))
+)